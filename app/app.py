@@ -1,20 +1,200 @@
 import argparse
+import itertools
 import logging as log
-import json
 import os
 import shutil
-from typing import Dict, Any
-
-from .file_manager import (
-    FileManager,
-    VIDEO_EXTENSIONS,
-    IMAGE_EXTENSIONS,
-    AUDIO_EXTENSIONS
-)
-from .command_generator import CommandGenerator
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from .file_manager import FileManager, ALL_EXTENSIONS
+from .command_generator import CommandGenerator, InvalidResponseError, LLMCommand, LOCAL_LLM_API_KEY
 from .command_executor import CommandExecutor
+from .response_cache import ResponseCache
 from . import utils
-import openai
+
+def _gather_system_info() -> Tuple[str, str, str, str, str]:
+    """
+    Collects ffmpeg and OS details for the LLM context.
+
+    Returns:
+        (ffmpeg_executable, ffmpeg_version, os_type, os_info, default_shell)
+
+    Raises:
+        FileNotFoundError: If ffmpeg is not found in PATH.
+    """
+    ffmpeg_executable = utils.get_ffmpeg_executable()
+    ffmpeg_version = utils.get_ffmpeg_version(ffmpeg_executable)
+    os_type, os_info = utils.get_os_info()
+    default_shell = utils.get_default_shell() or "Not detected"
+    return ffmpeg_executable, ffmpeg_version, os_type, os_info, default_shell
+
+def _is_api_error(error: BaseException) -> bool:
+    """
+    Whether `error` is an openai.APIError. The SDK is only imported once a request is
+    actually made, so if it isn't loaded the error can't have come from it.
+    """
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIError)
+
+def _report_missing_openai(error: ImportError, verbose: bool) -> None:
+    log.getLogger(__name__).error(f"Failed to import the openai package: {error}", exc_info=verbose)
+    utils.eprint(f"[ERROR] The 'openai' package is required: {error}. Install it with 'pip install openai'.")
+
+def _read_prompt_file(path: str) -> List[str]:
+    """
+    Reads the prompts of a --batch file: one per line, skipping blank lines and # comments.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with open(path, encoding="utf-8") as f:
+        stripped = (line.strip() for line in f)
+        return [line for line in stripped if line and not line.startswith("#")]
+
+def _print_explanation(explanation_data: Union[list, str]) -> None:
+    """Prints the LLM's explanation as a bullet list."""
+    print("\nExplanation:")
+    if isinstance(explanation_data, list):
+        print("- " + "\n- ".join(explanation_data))
+    else:
+        print(f"- {explanation_data}")
+
+def _generate_and_show(
+    command_generator: CommandGenerator,
+    conversation_history: Any,
+    system_context: Dict[str, Any],
+    temperature: Optional[float] = None,
+) -> LLMCommand:
+    """
+    Streams the LLM response, printing the explanation and the proposed command as soon as
+    each field closes (the command shows while the rest of the response is still arriving).
+
+    Returns:
+        The parsed LLMCommand.
+
+    Raises:
+        Same as CommandGenerator.generate_command().
+    """
+    shown = set()
+    stream = command_generator.generate_command_stream(conversation_history, system_context, temperature)
+    while True:
+        try:
+            field, value = next(stream)
+        except StopIteration as stop:
+            llm_command = stop.value
+            break
+        if field in shown:
+            continue
+        if field == "explanation":
+            _print_explanation(value or "No explanation provided.")
+        elif field == "command" and value and str(value).strip():
+            print(f"\nProposed Command:\n\t{str(value).strip()}\n")
+        else:
+            continue
+        shown.add(field)
+
+    # Fields that never streamed (e.g. a command recovered from malformed JSON)
+    if "explanation" not in shown:
+        _print_explanation(llm_command.explanation or "No explanation provided.")
+    if llm_command.command and "command" not in shown:
+        print(f"\nProposed Command:\n\t{llm_command.command}\n")
+    return llm_command
+
+def _parallel_jobs(llm_command: LLMCommand, file_manager: FileManager, detected_files: List[str]) -> List[str]:
+    """
+    Returns the per-file commands to run in parallel instead of the loop command, or an
+    empty list to run the loop.
+
+    The model only sees the (capped) detected-file list, so its per-file commands are
+    trusted only if each one names a different detected file and together they cover every
+    file in the directory with those extensions. Anything else falls back to the loop,
+    which globs the directory itself.
+    """
+    commands = llm_command.commands
+    if len(commands) <= 1:
+        return []
+    inputs = set()
+    for command in commands:
+        named = [path for path in detected_files if path in command]
+        if len(named) != 1:
+            return []
+        inputs.add(named[0])
+    if len(inputs) != len(commands):
+        return []
+    exts = {os.path.splitext(path)[1].lower() for path in inputs}
+    if len(file_manager.list_files(exts)) != len(commands):
+        log.getLogger(__name__).info("Per-file jobs don't cover every matching file; running the loop command instead.")
+        return []
+    return commands
+
+def _run_batch(
+    prompts: List[str],
+    command_generator: CommandGenerator,
+    command_executor: CommandExecutor,
+    system_context: Dict[str, Any],
+    args: argparse.Namespace,
+) -> int:
+    """
+    Runs a --batch file: generates every command with one LLM request, then shows and
+    executes them one after another.
+
+    Failed commands are reported rather than sent back to the LLM; rerun a failed prompt on
+    its own to get the interactive retry loop.
+
+    Returns:
+        Exit code (0 if every command succeeded, 1 otherwise).
+    """
+    logger = log.getLogger(__name__)
+    logger.info("Generating commands for %s prompts in batched requests...", len(prompts))
+    try:
+        llm_commands = command_generator.generate_commands_for_prompts(prompts, system_context)
+    except InvalidResponseError as e:
+        logger.error("Failed to parse batch response from LLM: %s", e, exc_info=args.verbose)
+        logger.error("Raw response was: %s", e.raw_response)
+        utils.eprint(f"[ERROR] The LLM did not return one command per prompt: {e}")
+        return 1
+    except ImportError as e:
+        _report_missing_openai(e, args.verbose)
+        return 1
+    except Exception as e:
+        if not _is_api_error(e):
+            raise
+        logger.error("OpenAI API error: %s", e, exc_info=args.verbose)
+        utils.eprint(f"Error communicating with the LLM API: {e}. Check connection/key/quota.")
+        return 1
+
+    failed = []
+    for index, (prompt, llm_command) in enumerate(zip(prompts, llm_commands), 1):
+        print(f"\n=== [{index}/{len(prompts)}] {prompt} ===")
+        _print_explanation(llm_command.explanation or "No explanation provided.")
+        if not llm_command.command:
+            print("\nNo command was generated for this prompt.")
+            failed.append(index)
+            continue
+        print(f"\nProposed Command:\n\t{llm_command.command}\n")
+        if args.dry_run:
+            print("[Dry Run] Command generated but not executed.")
+            continue
+
+        print("Executing command...")
+        logger.info("Executing command: %s", llm_command.command)
+        exec_success, output = command_executor.execute_with_retries(llm_command.command)
+        if not exec_success:
+            error_output = output if output else "Command failed with no specific output."
+            logger.error("Failure Output:\n%s", error_output, exc_info=args.verbose)
+            print(f"\n[ERROR] Command failed:\n{error_output}\n")
+            failed.append(index)
+
+    if failed:
+        logger.warning("%s of %s batch prompts failed: %s", len(failed), len(prompts), failed)
+        print(f"\n{len(failed)} of {len(prompts)} prompts failed (numbers {', '.join(map(str, failed))}).")
+        return 1
+    if not args.dry_run:
+        utils.print_art()
+    logger.info("Pixel Toaster finished successfully.")
+    return 0
 
 def run_toast_app(args: argparse.Namespace, config: Dict[str, Any]) -> int:
     """
@@ -30,45 +210,38 @@ def run_toast_app(args: argparse.Namespace, config: Dict[str, Any]) -> int:
     # Use a distinct variable name for the logger to avoid shadowing the module-level alias.
     logger = log.getLogger(__name__)  # Use module-specific logger
     logger.info("Starting Pixel Toaster application core logic...")
-    logger.debug(f"Received configuration: {config}")  # Log config only in debug
-    logger.debug(f"Received arguments: {args}")
+    # Config and args were already logged at DEBUG by main.py; don't repeat them here
 
     # --- Get Current Working Directory ---
     # Get CWD *when the function is called*, not at module import time
     current_workdir = os.getcwd()
-    logger.debug(f"Operating in directory: {current_workdir}")
+    logger.debug("Operating in directory: %s", current_workdir)
 
-    # --- Gather System and File Context ---
+    batch_prompts = []
+    if args.batch:
+        try:
+            batch_prompts = _read_prompt_file(args.batch)
+        except OSError as e:
+            logger.error("Could not read batch file %s: %s", args.batch, e, exc_info=args.verbose)
+            utils.eprint(f"[ERROR] Could not read batch file: {e}")
+            return 1
+        if not batch_prompts:
+            utils.eprint(f"[ERROR] Batch file {args.batch} contains no prompts.")
+            return 1
+
+    # --- Gather System Context (in the background) ---
     # (Keep dynamic detection for ffmpeg, OS etc. - less likely to be static config)
-    try:
-        ffmpeg_executable = utils.get_ffmpeg_executable()
-        ffmpeg_version = utils.get_ffmpeg_version(ffmpeg_executable)
-        os_type, os_info = utils.get_os_info()
-        default_shell = utils.get_default_shell() or "Not detected"
-    except FileNotFoundError as e:
-        logger.error(f"Initialization failed: {e}", exc_info=args.verbose)
-        utils.eprint(f"[ERROR] Initialization failed: {e}")
-        return 1
-    except Exception as e:
-        logger.warning(f"Could not gather some system info: {e}", exc_info=args.verbose)
-        ffmpeg_executable = shutil.which("ffmpeg") or "ffmpeg"
-        ffmpeg_version = "Unknown"
-        os_type, os_info = utils.get_os_info()
-        if not os_type:
-            os_type = "Unknown"
-        if not os_info:
-            os_info = "Unknown"
-        default_shell = utils.get_default_shell() or "Unknown"
+    # `ffmpeg -version` spawns a subprocess; run it on a worker thread so it overlaps with
+    # the directory scan below instead of adding to startup time. The openai SDK is not
+    # imported here at all: runs answered by a local template or the response cache never
+    # need it, and the generator imports it on the first API request.
+    executor = ThreadPoolExecutor(max_workers=1)
+    system_info_future = executor.submit(_gather_system_info)
+    executor.shutdown(wait=False)
 
     system_context: Dict[str, Any] = {
-        "os_type": os_type,
-        "os_info": os_info,
-        "shell": default_shell,
-        "ffmpeg_version": ffmpeg_version,
-        "ffmpeg_executable_path": ffmpeg_executable,
         "current_directory": current_workdir,  # Use dynamically determined CWD
     }
-    logger.debug(f"System Context: {system_context}")
 
     # --- File Context ---
     # Use current_workdir determined above
@@ -77,166 +250,256 @@ def run_toast_app(args: argparse.Namespace, config: Dict[str, Any]) -> int:
     explicit_file_path = None
     if args.file:
         explicit_file_path = os.path.abspath(args.file) if not os.path.isabs(args.file) else args.file
-        logger.debug(f"Explicit file specified via --file: {explicit_file_path}")
-    else:
+        logger.debug("Explicit file specified via --file: %s", explicit_file_path)
+    elif not batch_prompts:  # Each batch prompt names its own files; just list the directory
         explicit_file_path = file_manager.extract_explicit_filename(user_query_str)
         if explicit_file_path:
-            logger.debug(f"Explicit file extracted from query: {explicit_file_path}")
+            logger.debug("Explicit file extracted from query: %s", explicit_file_path)
 
     file_context_message = ""
     if explicit_file_path:
-        if os.path.isfile(explicit_file_path):
+        # A file found in the query already came from the directory snapshot (or an isfile
+        # check), so only a --file path still needs to be stat'ed here
+        if not args.file or os.path.isfile(explicit_file_path):
             system_context["explicit_input_file"] = explicit_file_path
             file_context_message = (
                 f"An explicit input file was provided ('{explicit_file_path}'). Use this exact path for the input."
             )
-            logger.info(f"Using explicit file: {explicit_file_path}")
+            logger.info("Using explicit file: %s", explicit_file_path)
         else:
-            logger.warning(f"Explicitly specified file not found: {explicit_file_path}", exc_info=args.verbose)
+            logger.warning("Explicitly specified file not found: %s", explicit_file_path, exc_info=args.verbose)
             file_context_message = (
                 f"User specified an input file ('{args.file or 'from query'}', resolved to '{explicit_file_path}'), "
                 "but it was not found. Inform the user if a file is needed or if the path is incorrect."
             )
     else:
-        all_media_extensions = VIDEO_EXTENSIONS | IMAGE_EXTENSIONS | AUDIO_EXTENSIONS
-        found_files = file_manager.list_files(all_media_extensions)
+        max_files_to_list = 15
+        # Take one extra file to know whether more exist, without scanning the rest of the directory
+        found_files = list(itertools.islice(file_manager.iter_files(ALL_EXTENSIONS), max_files_to_list + 1))
         if found_files:
-            max_files_to_list = 15
             files_to_mention_abs = found_files[:max_files_to_list]
-            relative_files = []
-            for f_abs in files_to_mention_abs:
-                try:
-                    rel_path = os.path.relpath(f_abs, current_workdir)
-                    relative_files.append(rel_path)
-                except ValueError:
-                    relative_files.append(f_abs)
+            # Files come from a scan of current_workdir, so stripping the prefix is enough
+            # (anything else, e.g. on another drive, is shown as an absolute path)
+            cwd_prefix = os.path.join(current_workdir, "")
+            relative_files = [
+                f_abs[len(cwd_prefix):] if f_abs.startswith(cwd_prefix) else f_abs
+                for f_abs in files_to_mention_abs
+            ]
             system_context["detected_files_in_directory"] = files_to_mention_abs
+            system_context["detected_files_truncated"] = len(found_files) > max_files_to_list
             file_list_str = ", ".join([f"'{f}'" for f in relative_files])
             message = f"Found media files in the current directory ('{current_workdir}'): {file_list_str}."
             if len(found_files) > max_files_to_list:
-                message += f" (and {len(found_files) - max_files_to_list} more...)"
+                message += " (and more...)"
             file_context_message = message
-            logger.info(f"Found media files (showing relative paths if possible): {', '.join(relative_files)}")
-            logger.debug(f"Absolute paths of found files (first {max_files_to_list}): {', '.join(files_to_mention_abs)}")
+            if logger.isEnabledFor(log.INFO):  # Skip the join when INFO output is off
+                logger.info("Found media files (showing relative paths if possible): %s", ", ".join(relative_files))
+            logger.debug("Absolute paths of found files (first %s): %s", max_files_to_list, files_to_mention_abs)
         else:
             file_context_message = (
                 f"No explicit input file was provided, and no common media files were detected in the current directory "
                 f"('{current_workdir}')."
             )
-            logger.info(f"No relevant media files detected in the current directory ({current_workdir}).")
+            logger.info("No relevant media files detected in the current directory (%s).", current_workdir)
 
     system_context["file_context_message"] = file_context_message
-    logger.debug(f"File Context Message for LLM: {file_context_message}")
+
+    try:
+        ffmpeg_executable, ffmpeg_version, os_type, os_info, default_shell = system_info_future.result()
+    except FileNotFoundError as e:
+        logger.error("Initialization failed: %s", e, exc_info=args.verbose)
+        utils.eprint(f"[ERROR] Initialization failed: {e}")
+        return 1
+    except Exception as e:
+        logger.warning("Could not gather some system info: %s", e, exc_info=args.verbose)
+        ffmpeg_executable = shutil.which("ffmpeg") or "ffmpeg"
+        ffmpeg_version = "Unknown"
+        os_type, os_info = utils.get_os_info()
+        if not os_type:
+            os_type = "Unknown"
+        if not os_info:
+            os_info = "Unknown"
+        default_shell = utils.get_default_shell() or "Unknown"
+
+    system_context.update({
+        "os_type": os_type,
+        "os_info": os_info,
+        "shell": default_shell,
+        "ffmpeg_version": ffmpeg_version,
+        "ffmpeg_executable_path": ffmpeg_executable,
+    })
+    logger.debug("System Context: %s", system_context)
+    logger.debug("File Context Message for LLM: %s", file_context_message)
 
     # --- Instantiate Core Components ---
     try:
         # Use the model specified in the config
         llm_model = config.get("llm_model", "gpt-4o-mini")  # Fallback just in case
-        logger.info(f"Using LLM model: {llm_model}")
-        # API key is already set globally by main.py
-        command_generator = CommandGenerator(model=llm_model)
+        local_model = config.get("local_llm_model")
+        local_base_url = config.get("local_llm_base_url", "http://localhost:11434/v1")
+        base_url = None
+        api_key = config.get("_resolved_api_key")  # Resolved by main.py, applied by the generator on first use
+        if args.local_only:
+            if not local_model:
+                utils.eprint("[ERROR] --local-only needs a local model: set 'local_llm_model' in the config file.")
+                return 1
+            # The local model serves every request; no draft step in front of it
+            llm_model, base_url, local_model = local_model, local_base_url, None
+            api_key = LOCAL_LLM_API_KEY  # Never send the OpenAI key to the local endpoint
+        elif args.cloud_only:
+            local_model = None
+        if local_model:
+            logger.info("Using LLM model: %s (local draft model: %s)", llm_model, local_model)
+        else:
+            logger.info("Using LLM model: %s", llm_model)
+        command_generator = CommandGenerator(
+            model=llm_model,
+            api_key=api_key,
+            base_url=base_url,
+            draft_model=local_model,
+            draft_base_url=local_base_url,
+            draft_timeout=config.get("local_llm_timeout", 30),
+            timeout=config.get("llm_timeout", 20),
+            max_retries=config.get("llm_max_retries", 2),
+            max_tokens=config.get("llm_max_tokens", 512),
+            response_cache=(
+                ResponseCache(ttl_days=config.get("llm_cache_ttl_days", 7), refresh=args.no_cache)
+                if config.get("llm_cache_enabled", True) else None
+            ),
+            local_routing=config.get("local_intents_enabled", True),
+        )
         command_executor = CommandExecutor()
     except Exception as e:
         logger.error("Failed to instantiate core components:", exc_info=args.verbose)
         utils.eprint(f"[ERROR] Failed to set up core components: {e}")
         return 1
 
+    if batch_prompts:
+        return _run_batch(batch_prompts, command_generator, command_executor, system_context, args)
+
     # --- Interaction Loop ---
-    conversation_history = []
     current_user_prompt = user_query_str
     max_retry_attempts = 3
     attempts = 0
+    # Malformed JSON is rare with response_format=json_object; its re-asks get their own
+    # small budget instead of using up attempts meant for execution failures
+    max_invalid_json_retries = 2
+    invalid_json_retries = 0
+    # At most one user turn per loop iteration plus the latest assistant reply, so this bound
+    # caps the prompt size without ever evicting the original request (the first entry)
+    conversation_history = deque(maxlen=max_retry_attempts + max_invalid_json_retries + 1)
+    last_role = None  # Role of conversation_history[-1], tracked to avoid re-indexing
     last_generated_command = ""
+    # Commands that already failed here; running one again can only fail the same way
+    failed_commands = set()
+    retry_temperature = None  # Raised when the LLM repeats a failed command
     success = False
 
     logger.info("Starting command generation and execution loop...")
 
     while attempts < max_retry_attempts:
         attempts += 1
-        logger.info(f"--- Attempt #{attempts} ---")
+        logger.info("--- Attempt #%s ---", attempts)
 
         if not current_user_prompt:
             logger.error("No user prompt available for this attempt.")
             return 1
-        if not conversation_history or conversation_history[-1].get("content") != current_user_prompt:
+        if last_role != "user" or conversation_history[-1]["content"] != current_user_prompt:
             conversation_history.append({"role": "user", "content": current_user_prompt})
+            last_role = "user"
         current_user_prompt = None
         last_generated_command = ""
 
         try:
-            # --- 1. Generate Command ---
+            # --- 1. Generate and Display Command ---
             logger.debug("Generating command via LLM...")
-            # Pass system_context which includes dynamic info + CWD
-            raw_response = command_generator.generate_command(conversation_history, system_context)
-            logger.debug(f"LLM raw response: {raw_response}")
-            cleaned_json = command_generator.clean_json_response(raw_response)
-            logger.debug(f"LLM cleaned response: {cleaned_json}")
-
-            # --- 2. Parse Response ---
+            # Pass system_context which includes dynamic info + CWD. The response is parsed once,
+            # inside the generator, and each field is printed as soon as it arrives.
             try:
-                parsed_response = json.loads(cleaned_json)
-                explanation_data = parsed_response.get("explanation", "No explanation provided.")
-                command_to_execute = parsed_response.get("command", "").strip()
-                last_generated_command = command_to_execute
-                conversation_history.append({"role": "assistant", "content": cleaned_json})
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response from LLM: {e}", exc_info=args.verbose)
-                logger.error(f"Raw response was: {raw_response}")
+                llm_command = _generate_and_show(
+                    command_generator, conversation_history, system_context, temperature=retry_temperature
+                )
+            except InvalidResponseError as e:
+                logger.error("Failed to parse JSON response from LLM: %s", e, exc_info=args.verbose)
+                logger.error("Raw response was: %s", e.raw_response)
+                print("\nThe LLM response was incomplete or malformed; asking again...")
                 current_user_prompt = (
-                    "The previous response was not valid JSON. Please provide the response strictly in the required JSON format.\n"
-                    f"Previous invalid response:\n{raw_response}"
+                    f"The previous response could not be used: {e} Please provide the complete response "
+                    "strictly in the required JSON format, keeping the explanation brief.\n"
+                    f"Previous invalid response:\n{e.raw_response}"
                 )
-                # Remove assistant's bad response if added
-                if conversation_history and conversation_history[-1]["role"] == "assistant":
-                    conversation_history.pop()
+                if invalid_json_retries < max_invalid_json_retries:
+                    invalid_json_retries += 1
+                    attempts -= 1  # Don't count this against the execution attempts
                 # Continue to retry generation
                 continue
+            logger.debug("LLM response: %s", llm_command.raw)
+            command_to_execute = llm_command.command
+            last_generated_command = command_to_execute
+            conversation_history.append({"role": "assistant", "content": llm_command.raw})
+            last_role = "assistant"
 
-            # --- 3. Handle Cases Without a Command ---
+            # --- 2. Handle Cases Without a Command ---
             if not command_to_execute:
                 logger.warning("LLM did not provide a command.")
-                print("\nExplanation / Response:")
-                if isinstance(explanation_data, list):
-                    print("- " + "\n- ".join(explanation_data))
-                else:
-                    print(f"- {explanation_data}")
                 print("\nCannot proceed without a command.")
                 success = False
                 break
 
-            # --- 4. Display Information ---
-            print("\nExplanation:")
-            if isinstance(explanation_data, list):
-                print("- " + "\n- ".join(explanation_data))
-            else:
-                print(f"- {explanation_data}")
-            print(f"\nProposed Command:\n\t{command_to_execute}\n")
+            if command_to_execute in failed_commands:
+                # Typical at low temperature: the same history gets the same answer back. Skip
+                # the doomed run and ask again, sampling more freely this time.
+                logger.warning("LLM repeated a command that already failed: %s", command_to_execute)
+                print("\nThe LLM suggested a command that already failed; asking for a different approach...")
+                retry_temperature = min(1.0, (retry_temperature or command_generator.temperature) + 0.4)
+                current_user_prompt = (
+                    f"You suggested this command again, but it already failed:\n`{command_to_execute}`\n"
+                    "Do not repeat it. Provide a structurally different command that avoids the earlier error."
+                )
+                conversation_history.pop()
+                last_role = conversation_history[-1]["role"] if conversation_history else None
+                continue
+
+            # Independent per-file jobs run in parallel instead of the loop, if they cover every file
+            parallel_commands = _parallel_jobs(
+                llm_command, file_manager, system_context.get("detected_files_in_directory") or []
+            )
+            if parallel_commands:
+                # These, not the loop shown above, are what runs (or would run, on a dry run)
+                print(f"Proposed Commands ({len(parallel_commands)} independent jobs, run in parallel instead of the command above):")
+                print("\n".join(f"\t{job}" for job in parallel_commands) + "\n")
 
-            # --- 5. Handle Dry Run ---
+            # --- 3. Handle Dry Run ---
             if args.dry_run:
                 logger.info("Dry-run mode enabled. Command not executed.")
                 print("[Dry Run] Command generated but not executed.")
                 success = True
                 break
 
-            # --- 6. Execute Command ---
+            # --- 4. Execute Command ---
             print("Executing command...")
-            logger.info(f"Executing command: {command_to_execute}")
-            exec_success, output = command_executor.execute_with_retries(command_to_execute)
+            if parallel_commands:
+                logger.info("Executing %s parallel jobs: %s", len(parallel_commands), parallel_commands)
+                exec_success, output = command_executor.execute_parallel(parallel_commands)
+            else:
+                logger.info("Executing command: %s", command_to_execute)
+                exec_success, output = command_executor.execute_with_retries(command_to_execute)
 
-            # --- 7. Handle Execution Result ---
+            # --- 5. Handle Execution Result ---
             if exec_success:
                 logger.info("Command executed successfully!")
+                command_generator.remember_successful_response(llm_command)
                 if output:
-                    logger.debug(f"Command output:\n{output}")
-                    print(f"Output:\n{output}")
+                    # Already shown live by the executor; just keep it for debugging
+                    logger.debug("Command output:\n%s", output)
                 utils.print_art()
                 success = True
                 break
             else:
                 logger.error("Command execution failed.", exc_info=args.verbose)
+                failed_commands.add(command_to_execute)
                 error_output_for_llm = output if output else "Command failed with no specific output."
-                logger.error(f"Failure Output:\n{error_output_for_llm}", exc_info=args.verbose)
+                logger.error("Failure Output:\n%s", error_output_for_llm, exc_info=args.verbose)
                 print(f"\n[ERROR] Command failed:\n{error_output_for_llm}\n")
 
                 if attempts < max_retry_attempts:
@@ -247,8 +510,9 @@ def run_toast_app(args: argparse.Namespace, config: Dict[str, Any]) -> int:
                         f"Error Output:\n```\n{error_output_for_llm}\n```\n"
                         "Please analyze the error and the original request history to provide a corrected command."
                     )
-                    if conversation_history and conversation_history[-1]["role"] == "assistant":
+                    if last_role == "assistant":
                         conversation_history.pop()
+                        last_role = conversation_history[-1]["role"] if conversation_history else None
                     # Continue to the next iteration
                 else:
                     logger.warning("Maximum retry attempts reached after command failure.", exc_info=args.verbose)
@@ -256,14 +520,17 @@ def run_toast_app(args: argparse.Namespace, config: Dict[str, Any]) -> int:
                     break
 
         # --- Error Handling for LLM Interaction ---
-        except openai.APIError as e:
-            logger.error(f"OpenAI API error: {e}", exc_info=args.verbose)
-            utils.eprint(f"Error communicating with the LLM API: {e}. Check connection/key/quota.")
+        except ImportError as e:  # The openai SDK is imported on the first API request
+            _report_missing_openai(e, args.verbose)
             success = False
             break
         except Exception as e:
-            logger.error("An unexpected error occurred in the main loop:", exc_info=args.verbose)
-            utils.eprint(f"An unexpected error occurred: {e}. Aborting.")
+            if _is_api_error(e):
+                logger.error("OpenAI API error: %s", e, exc_info=args.verbose)
+                utils.eprint(f"Error communicating with the LLM API: {e}. Check connection/key/quota.")
+            else:
+                logger.error("An unexpected error occurred in the main loop:", exc_info=args.verbose)
+                utils.eprint(f"An unexpected error occurred: {e}. Aborting.")
             success = False
             break
 
@@ -1,15 +1,52 @@
+import io
+import os
+import random
+import re
 import subprocess
 import shlex
+import sys
+import threading
 import time
 import logging as log
-from typing import Tuple, Union, List
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
 import platform
 import shutil
 
+# Anything that needs a shell, matched in a single pass: a leading loop/conditional keyword,
+# shell operators (;, &&, ||, |, redirects, backticks), $VAR / ${...} expansions and, on
+# Windows, %VAR% variables
+SHELL_SYNTAX_RE = re.compile(
+    r"\A\s*(?i:for|while|if|case) "
+    r"|[;|<>`]|&&"
+    r"|\$(?:\{|\w)"
+    + (r"|%\w+%" if platform.system() == "Windows" else "")
+)
+
+# Only the tail of a command's output is kept for error analysis / the LLM retry prompt
+MAX_CAPTURED_OUTPUT_BYTES = 32 * 1024
+MAX_CAPTURED_OUTPUT_LINES = 50
+
+def _output_tail(data: bytes) -> str:
+    """
+    Decodes captured output into its last MAX_CAPTURED_OUTPUT_LINES lines.
+    ffmpeg redraws its progress line with '\r'; only the final state of each line is kept,
+    as a terminal would show it, so progress updates don't crowd out the actual error.
+    """
+    lines = [line.rstrip("\r").rsplit("\r", 1)[-1] for line in data.decode("utf-8", "replace").split("\n")]
+    lines = [line for line in lines if line.strip()]
+    return "\n".join(lines[-MAX_CAPTURED_OUTPUT_LINES:]).strip()
+
+@lru_cache(maxsize=32)
+def _which(executable: str) -> Optional[str]:
+    """shutil.which, memoized: retries and parallel jobs resolve the same executable repeatedly."""
+    return shutil.which(executable)
+
 class CommandExecutor:
-    def __init__(self, max_retries: int = 2, verbose: bool = False):
+    def __init__(self, max_retries: int = 2, verbose: bool = False, stream_output: bool = True):
         self.max_retries = max_retries
         self.verbose = verbose
+        self.stream_output = stream_output  # Echo output to the terminal while the command runs
 
     def _looks_like_shell_script(self, command: str) -> bool:
         """
@@ -17,26 +54,7 @@ class CommandExecutor:
         Checks for shell keywords, loops, pipes, redirects, variable expansion etc.
         This is not exhaustive but covers common cases generated by the LLM.
         """
-        command_lower = command.lower().strip()
-        # Keywords often starting a command requiring shell=True
-        if command_lower.startswith(('for ', 'while ', 'if ', 'case ')):
-            return True
-        # Common shell operators indicating complexity
-        if any(op in command for op in [';', '&&', '||', '|', '>', '<', '`']):
-            return True
-        # Shell variable expansions (simple check)
-        # Match ${...} or $VAR type patterns (but avoid simple $ signs)
-        if '$' in command and ('{' in command or command.split('$')[-1].split()[0].isalnum()):
-             return True
-        # Match %VAR% on Windows
-        if '%' in command and platform.system() == "Windows":
-             # Basic check for %...% pattern
-             parts = command.split('%')
-             if len(parts) > 2 and parts[1].isalnum():  # Check if there's something between %
-                 return True
-
-        # Default to False if none of the above are strongly indicative
-        return False
+        return SHELL_SYNTAX_RE.search(command) is not None
 
     def run_command(self, command: str) -> Tuple[bool, str]:
         """
@@ -44,7 +62,7 @@ class CommandExecutor:
         otherwise uses shlex.split for safety.
         Returns (success, combined_output).
         """
-        log.info(f"Executing: {command}")
+        log.info("Executing: %s", command)
         use_shell = self._looks_like_shell_script(command)
         command_to_run: Union[str, List[str]]  # Type hint for clarity
         error_prefix = ""  # Store specific errors like FileNotFoundError
@@ -59,44 +77,72 @@ class CommandExecutor:
                 if not command_to_run:
                     return False, "Empty command after shlex.split"
                 # Check executable existence only when not using shell=True implicitly
-                executable_path = shutil.which(command_to_run[0])
+                executable_path = _which(command_to_run[0])
                 if not executable_path:
                      error_prefix = f"Error: Command executable '{command_to_run[0]}' not found in PATH."
                      log.error(error_prefix, exc_info=self.verbose)
                      # Let subprocess.run raise the FileNotFoundError for consistency
                 else:
-                     # Optionally log the found path
-                     log.debug(f"Found executable for '{command_to_run[0]}': {executable_path}")
+                     log.debug("Found executable for '%s': %s", command_to_run[0], executable_path)
+                     # Exec the resolved path directly so Popen doesn't search PATH a second time
+                     command_to_run[0] = executable_path
 
-            # Execute using subprocess.run
-            completed_process = subprocess.run(
+            # Stream the merged stdout/stderr instead of buffering it all: the user sees
+            # ffmpeg's progress live, and memory stays bounded on long transcodes
+            process = subprocess.Popen(
                 command_to_run,
                 shell=use_shell,  # Set based on detection
-                capture_output=True,
-                text=True,
-                check=False,  # We check returncode manually
-                timeout=300  # Add a timeout (e.g., 5 minutes) for safety
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
             )
+            # stdout=PIPE with the default buffering is always a BufferedReader (which has read1)
+            stdout = process.stdout
+            assert isinstance(stdout, io.BufferedReader)
+            timed_out = threading.Event()
 
-            # Combine stdout and stderr for output context
-            combined_output = ""
-            if completed_process.stdout:
-                 combined_output += f"Stdout:\n{completed_process.stdout.strip()}\n"
-            if completed_process.stderr:
-                 combined_output += f"Stderr:\n{completed_process.stderr.strip()}"
-            combined_output = combined_output.strip()
+            def _kill_on_timeout():
+                timed_out.set()
+                process.kill()
 
-            if completed_process.returncode == 0:
-                log.debug(f"Command successful. Output:\n{combined_output or '<No output>'}")
+            timer = threading.Timer(300, _kill_on_timeout)  # Timeout (5 minutes) for safety
+            timer.start()
+            tail = bytearray()
+            if self.stream_output:
+                sys.stdout.flush()  # Keep anything already printed ahead of the command's output
+            try:
+                while True:
+                    chunk = stdout.read1(8192)
+                    if not chunk:
+                        break
+                    if self.stream_output:
+                        sys.stdout.buffer.write(chunk)
+                        sys.stdout.buffer.flush()
+                    tail += chunk
+                    if len(tail) > 2 * MAX_CAPTURED_OUTPUT_BYTES:
+                        del tail[:-MAX_CAPTURED_OUTPUT_BYTES]
+                returncode = process.wait()
+            finally:
+                timer.cancel()
+                stdout.close()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(command_to_run, 300)
+
+            if len(tail) > MAX_CAPTURED_OUTPUT_BYTES:
+                del tail[:-MAX_CAPTURED_OUTPUT_BYTES]
+            # Combined stdout and stderr (interleaved as produced) for output context
+            combined_output = _output_tail(bytes(tail))
+
+            if returncode == 0:
+                log.debug("Command successful. Output:\n%s", combined_output or '<No output>')
                 return True, combined_output
             else:
-                error_message = f"Command failed with exit code {completed_process.returncode}."
+                error_message = f"Command failed with exit code {returncode}."
                 # Prepend specific error if found earlier
                 if error_prefix:
                     error_message = f"{error_prefix}\n{error_message}"
                 log.error(error_message, exc_info=self.verbose)
                 if combined_output:
-                    log.error(f"Output:\n{combined_output}", exc_info=self.verbose)
+                    log.error("Output:\n%s", combined_output, exc_info=self.verbose)
                 # Return the combined output which includes stderr for error analysis
                 return False, f"{error_message}\n{combined_output}"
 
@@ -117,6 +163,82 @@ class CommandExecutor:
             log.error("Subprocess execution error details:", exc_info=self.verbose)
             return False, err_msg
 
+    def execute_parallel(self, commands: List[str], max_parallel: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        Run independent commands (e.g. one ffmpeg job per input file) concurrently.
+        At most `max_parallel` run at once (default: half the CPU cores, since ffmpeg
+        is itself multi-threaded). Output is captured per job, not streamed.
+        Returns (all_succeeded, output of the failed jobs).
+        """
+        if max_parallel is None:
+            max_parallel = max(1, (os.cpu_count() or 2) // 2)
+        log.info("Executing %s jobs, up to %s at a time.", len(commands), max_parallel)
+        # Imported here: asyncio is a sizeable share of CLI start-up and only batches need it
+        import asyncio
+
+        results = asyncio.run(self._run_all(commands, max_parallel))
+
+        failures = [
+            f"Command: {command}\n{output}" for command, (success, output) in zip(commands, results) if not success
+        ]
+        if failures:
+            log.error("%s of %s jobs failed.", len(failures), len(commands), exc_info=self.verbose)
+            return False, "\n\n".join(failures)
+        return True, ""
+
+    async def _run_all(self, commands: List[str], max_parallel: int) -> List[Tuple[bool, str]]:
+        import asyncio
+
+        semaphore = asyncio.Semaphore(max_parallel)
+        total = len(commands)
+        # Keep the combined error output for the LLM within the single-command budget
+        tail_bytes = max(1024, MAX_CAPTURED_OUTPUT_BYTES // total)
+
+        async def run_one(index: int, command: str) -> Tuple[bool, str]:
+            async with semaphore:
+                success, output = await self._run_command_async(command, tail_bytes)
+            print(f"[{index}/{total}] {'done' if success else 'FAILED'}: {command}")
+            return success, output
+
+        return await asyncio.gather(*(run_one(i, cmd) for i, cmd in enumerate(commands, 1)))
+
+    async def _run_command_async(self, command: str, tail_bytes: int) -> Tuple[bool, str]:
+        """Async counterpart of run_command for one job; returns (success, output tail)."""
+        import asyncio
+
+        log.debug("Executing job: %s", command)
+        try:
+            if self._looks_like_shell_script(command):
+                process = await asyncio.create_subprocess_shell(
+                    command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+                )
+            else:
+                args = shlex.split(command)
+                if not args:
+                    return False, "Empty command after shlex.split"
+                args[0] = _which(args[0]) or args[0]
+                process = await asyncio.create_subprocess_exec(
+                    *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+                )
+            try:
+                stdout, _ = await asyncio.wait_for(process.communicate(), timeout=300)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return False, "Error: Command timed out after 300 seconds."
+        except FileNotFoundError as e:
+            return False, f"Error: FileNotFoundError during command execution. Command not found? Details: {e}"
+        except ValueError as e:
+            return False, f"Error splitting command string (check quoting): {e}"
+        except Exception as e:
+            log.error("Subprocess execution error details:", exc_info=self.verbose)
+            return False, f"Subprocess execution error: {str(e)}"
+
+        output = _output_tail(stdout[-tail_bytes:])
+        if process.returncode == 0:
+            return True, output
+        return False, f"Command failed with exit code {process.returncode}.\n{output}"
+
     def execute_with_retries(self, command: str) -> Tuple[bool, str]:
         """
         Execute the command, retrying on failure with exponential backoff.
@@ -128,7 +250,7 @@ class CommandExecutor:
 
         while attempt < max_exec_retries:
             attempt += 1
-            log.debug(f"Execution attempt #{attempt} of {max_exec_retries}")
+            log.debug("Execution attempt #%s of %s", attempt, max_exec_retries)
 
             success, output = self.run_command(command)
 
@@ -147,18 +269,20 @@ class CommandExecutor:
                 ]
                 if any(err_text in output for err_text in no_retry_errors):
                      log.warning(
-                         f"Command failed due to specific error, not retrying execution. Error text contained: {output[:200]}...",
-                         exc_info=self.verbose
+                         "Command failed due to specific error, not retrying execution. Error text contained: %s...",
+                         output[:200], exc_info=self.verbose
                      )
                      break  # Exit retry loop
 
                 # If retries remain, wait and log
                 if attempt < max_exec_retries:
-                    sleep_time = 2 ** attempt
-                    log.warning(f"Command failed. Retrying execution in {sleep_time} seconds...", exc_info=self.verbose)
+                    # Full jitter: a random wait up to the exponential cap, so a retry that would
+                    # succeed right away isn't held back by the whole backoff
+                    sleep_time = random.uniform(0, 2 ** attempt)
+                    log.warning("Command failed. Retrying execution in %.1f seconds...", sleep_time, exc_info=self.verbose)
                     time.sleep(sleep_time)
                 else:
-                     log.error(f"Command failed after maximum {max_exec_retries} execution retries.", exc_info=self.verbose)
+                     log.error("Command failed after maximum %s execution retries.", max_exec_retries, exc_info=self.verbose)
 
         # If loop finishes without success
         return False, last_error_output
\ No newline at end of file
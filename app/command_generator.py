@@ -1,16 +1,91 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 import os
-import json
 import re
-import logging as log
-import openai
+import shlex
+import logging
 from pathlib import Path
 import sys # <-- Import sys module
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Generator, List, Optional, Tuple, Union
+
+from . import json_stream
+from .command_executor import SHELL_SYNTAX_RE
+from .json_stream import StreamingJsonParser, extract_json_object
+from .intent_router import route_locally
+from .response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    import openai  # The SDK is heavy to import; it's loaded lazily where a client is created
 
 # Initialize logger for this module
-log = log.getLogger(__name__)
+log = logging.getLogger(__name__)
 
 # Path to the system prompt template file is determined dynamically in __init__
 
+# Number of formatted system prompts kept per CommandGenerator (LRU)
+PROMPT_CACHE_SIZE = 8
+
+# Words/patterns in the user's request that imply processing multiple files
+
+# Completion budget cap for one --batch request (many models can't produce more output than
+# this); larger batch files are split into several requests
+MAX_BATCH_COMPLETION_TOKENS = 4096
+
+# --batch request groups in flight at once
+MAX_CONCURRENT_BATCH_REQUESTS = 10
+
+# Prepended to the numbered prompts of a --batch file, which are answered together
+PROMPT_LIST_INSTRUCTIONS = (
+    "Handle each numbered request below independently, as if it had been sent on its own. "
+    'Return a JSON object with a single key, "results": a list with exactly one '
+    '{"explanation": [...], "command": "..."} object per request, in the same order. '
+    "Use an empty command for a request you cannot fulfil.\n\n"
+)
+
+# Local OpenAI-compatible servers (e.g. Ollama) ignore the key, but the client requires one.
+# Never send the real OpenAI key to them.
+LOCAL_LLM_API_KEY = "ollama"
+
+# Whitespace runs and trailing sentence punctuation don't change what a request asks for
+_QUERY_WHITESPACE_RE = re.compile(r"\s+")
+_QUERY_TRAILING_PUNCT_RE = re.compile(r"[\s.!?]+$")
+
+
+def _normalize_query(query: str) -> str:
+    """
+    Canonical form of a user query for the response cache key, so trivially different
+    spellings of the same request ("convert  foo.mov to mp4." vs "convert foo.mov to mp4")
+    share one entry. Case is kept: it can matter (text overlays, file names).
+    """
+    return _QUERY_TRAILING_PUNCT_RE.sub("", _QUERY_WHITESPACE_RE.sub(" ", query.strip()))
+
+
+def _select_prompt_section(template: str, keep: str, drop: str) -> str:
+    """Removes the `{% drop %}...{% /drop %}` block from the template and unwraps the `keep` block."""
+    template = re.sub(rf"\{{% {drop} %\}}\n.*?\{{% /{drop} %\}}\n", "", template, flags=re.DOTALL)
+    return re.sub(rf"\{{% /?{keep} %\}}\n", "", template)
+
+
+@dataclass
+class LLMCommand:
+    """A parsed LLM response: the command to run, its explanation, and the raw JSON text."""
+    __slots__ = ("explanation", "command", "commands", "raw")
+    explanation: Union[List[str], str]
+    command: str
+    commands: List[str]  # Optional independent per-file commands for a batch (may run in parallel)
+    raw: str  # JSON text as returned by the LLM, kept for the conversation history
+
+
+class InvalidResponseError(ValueError):
+    """Raised when the LLM response can't be parsed into a JSON object."""
+
+    def __init__(self, message: str, raw_response: str):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+
 class CommandGenerator:
     """
     Generates FFmpeg commands using an LLM based on user prompts and system context.
@@ -19,7 +94,22 @@ class CommandGenerator:
     and interacts with the OpenAI API to produce a command string and explanation in JSON format.
     """
 
-    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.1):
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.1,
+        api_key: Optional[str] = None,
+        timeout: float = 20.0,
+        max_retries: int = 2,
+        max_tokens: int = 512,
+        min_interval_s: float = 1.5,
+        response_cache: Optional[ResponseCache] = None,
+        local_routing: bool = True,
+        base_url: Optional[str] = None,
+        draft_model: Optional[str] = None,
+        draft_base_url: str = "http://localhost:11434/v1",
+        draft_timeout: float = 30.0,
+    ):
         """
         Initializes the CommandGenerator.
 
@@ -27,9 +117,44 @@ class CommandGenerator:
             model: The name of the OpenAI model to use (e.g., "gpt-4o-mini").
                    Passed from configuration.
             temperature: The sampling temperature for the LLM.
+            api_key: OpenAI API key. The client is created lazily with it,
+                     right before the first API request.
+            timeout: Per-request timeout in seconds, so a stuck connection can't hang the CLI.
+            max_retries: Retries the OpenAI client performs on transient errors.
+            max_tokens: Upper bound on tokens generated per response.
+            min_interval_s: Minimum spacing between consecutive API calls (pro-active throttling).
+            response_cache: Optional persistent cache. A first-turn request whose key is cached
+                            skips the API; see remember_successful_response().
+            local_routing: Build trivial first-turn requests (plain conversions) from local
+                           templates instead of calling the API; see intent_router.
+            base_url: Optional OpenAI-compatible endpoint for the main client (e.g. a local
+                      Ollama server); None uses the OpenAI API.
+            draft_model: Optional local model (e.g. "qwen2.5-coder:1.5b") asked first on the
+                         first turn; its answer is used only if it passes validation, otherwise
+                         the main model is asked. Retries always use the main model.
+            draft_base_url: OpenAI-compatible endpoint serving draft_model (Ollama's default).
+            draft_timeout: Per-request timeout for the draft model, in seconds.
         """
         self.model = model
         self.temperature = temperature
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens
+        self.min_interval_s = min_interval_s
+        self._client: Optional["openai.OpenAI"] = None
+        self._last_call_ts: Optional[float] = None
+        self._throttle_lock = threading.Lock()  # --batch request groups are sent from worker threads
+        self._thread_state = threading.local()  # Per-thread finish_reason of the last streamed response
+        self._prompt_cache: OrderedDict[tuple, str] = OrderedDict()
+        self.response_cache = response_cache
+        self._request_cache_key: Optional[str] = None  # Key of the original request in this conversation
+        self.local_routing = local_routing
+        self.base_url = base_url
+        self.draft_model = draft_model
+        self.draft_base_url = draft_base_url
+        self.draft_timeout = draft_timeout
+        self._draft_client: Optional["openai.OpenAI"] = None
         prompt_path = None # Initialize prompt_path
 
         try:
@@ -38,7 +163,7 @@ class CommandGenerator:
             if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
                 # Running in a PyInstaller bundle
                 # sys._MEIPASS is the path to the temporary folder created by PyInstaller
-                log.debug(f"Running bundled. sys._MEIPASS: {sys._MEIPASS}")
+                log.debug("Running bundled. sys._MEIPASS: %s", sys._MEIPASS)
                 base_path = Path(sys._MEIPASS)
                 # Construct the path relative to the bundle root.
                 # Assumes system_prompt.txt was bundled into the 'app' directory,
@@ -46,16 +171,16 @@ class CommandGenerator:
                 prompt_path = base_path / "app" / "system_prompt.txt"
             else:
                 # Running as a normal script from source
-                log.debug(f"Running from source. __file__: {__file__}")
+                log.debug("Running from source. __file__: %s", __file__)
                 # __file__ points to this script (command_generator.py)
                 # .parent gives the directory containing this script (app/)
                 base_path = Path(__file__).parent
                 prompt_path = base_path / "system_prompt.txt"
 
-            log.debug(f"Attempting to load system prompt from resolved path: {prompt_path}")
+            log.debug("Attempting to load system prompt from resolved path: %s", prompt_path)
             with open(prompt_path, 'r', encoding='utf-8') as f:
                 self.system_prompt_template = f.read()
-            log.debug(f"Successfully loaded system prompt template from {prompt_path}")
+            log.debug("Successfully loaded system prompt template from %s", prompt_path)
 
         except FileNotFoundError:
             error_msg = f"System prompt template file not found at expected location: {prompt_path}"
@@ -70,10 +195,16 @@ class CommandGenerator:
             raise FileNotFoundError(error_msg) # Re-raise with detailed message
         except Exception as e:
             # Catch any other loading errors
-            log.error(f"Error loading system prompt template from {prompt_path}: {e}", exc_info=True)
+            log.error("Error loading system prompt template from %s: %s", prompt_path, e, exc_info=True)
             raise # Re-raise the original exception
 
-        log.debug(f"CommandGenerator initialized with model: {self.model}, temperature: {self.temperature}")
+        # Specialized variants: the batch/loop rules are dead context when only one file is in play
+        self._prompt_templates = {
+            True: _select_prompt_section(self.system_prompt_template, keep="BATCH", drop="SINGLE"),
+            False: _select_prompt_section(self.system_prompt_template, keep="SINGLE", drop="BATCH"),
+        }
+
+        log.debug("CommandGenerator initialized with model: %s, temperature: %s", self.model, self.temperature)
 
     # --- Helper methods (_format_file_context, _prepare_llm_messages, _call_llm_api) ---
     # These remain unchanged from the previous version where they were refactored.
@@ -97,7 +228,12 @@ class CommandGenerator:
             file_context_lines.append(f"- Explicit input file provided: '{explicit_file}' (Use this exact path)")
         if detected_files:
             relative_files_for_prompt = []
+            # Files under the CWD (the common case) just drop the prefix; relpath is only a fallback
+            cwd_prefix = os.path.join(os.path.abspath(cwd), "")
             for f_abs in detected_files:
+                if f_abs.startswith(cwd_prefix):
+                    relative_files_for_prompt.append(f_abs[len(cwd_prefix):])
+                    continue
                 try:
                     # Attempt to get relative path for brevity in prompt
                     rel_path = os.path.relpath(f_abs, cwd)
@@ -108,7 +244,7 @@ class CommandGenerator:
                         relative_files_for_prompt.append(f_abs) # Fallback to absolute
                 except ValueError:
                     # Files might be on different drives (Windows)
-                    log.warning(f"Could not create relative path for '{f_abs}' from CWD '{cwd}'. Using absolute path in prompt context.")
+                    log.warning("Could not create relative path for '%s' from CWD '%s'. Using absolute path in prompt context.", f_abs, cwd)
                     relative_files_for_prompt.append(f_abs) # Use absolute path
 
             files_list_str = ", ".join([f"'{f}'" for f in relative_files_for_prompt])
@@ -117,6 +253,8 @@ class CommandGenerator:
             if detected_files: # Add note only if files were actually detected
                 # Clarify that absolute paths should be used in commands if needed
                 file_context_lines.append(f"- Note: In the generated command, use full absolute paths for these files where necessary (e.g., '{detected_files[0]}' ...).")
+            if system_context.get("detected_files_truncated"):
+                file_context_lines.append("- Note: This list is incomplete; the directory contains more media files than are listed.")
 
         # Add the summary message if it exists and provides unique info
         summary_msg = system_context.get("file_context_message", "")
@@ -146,12 +284,69 @@ class CommandGenerator:
             ValueError: If the system context dictionary is missing required keys
                         for prompt formatting.
         """
+        # Reuse the formatted prompt when nothing it depends on has changed (e.g. retry turns).
+        # A byte-identical prefix also lets the API's server-side prompt cache hit.
+        batch_mode = self._is_batch_request(system_context)
+        cache_key = (
+            batch_mode,
+            system_context.get("current_directory", "."),
+            tuple(system_context.get("detected_files_in_directory") or ()),
+            bool(system_context.get("detected_files_truncated")),
+            system_context.get("explicit_input_file"),
+            system_context.get("file_context_message", ""),
+            system_context.get("os_info", "Unknown"),
+            system_context.get("os_type", "Unknown"),
+            system_context.get("shell", "Unknown"),
+            system_context.get("ffmpeg_version", "Unknown"),
+            system_context.get("ffmpeg_executable_path", "ffmpeg"),
+        )
+        formatted_system_prompt = self._prompt_cache.get(cache_key)
+        if formatted_system_prompt is not None:
+            self._prompt_cache.move_to_end(cache_key)
+            log.debug("Reusing cached system prompt.")
+        else:
+            formatted_system_prompt = self._format_system_prompt(system_context, batch_mode)
+            self._prompt_cache[cache_key] = formatted_system_prompt
+            if len(self._prompt_cache) > PROMPT_CACHE_SIZE:
+                self._prompt_cache.popitem(last=False)
+
+        messages = [{"role": "system", "content": formatted_system_prompt}]
+        # Filter out empty user messages if any crept in
+        valid_history = [msg for msg in conversation_history if msg.get("content")]
+        messages.extend(valid_history) # Add user prompts, assistant responses, errors etc.
+
+        return messages
+
+    @staticmethod
+    def _is_batch_request(system_context: dict[str, str]) -> bool:
+        """
+        Decides whether the batch/loop rules belong in the system prompt.
+
+        They are dropped only when no loop can be needed: an explicit input file was given,
+        or at most one file was detected. Whether several detected files call for a loop
+        ("the mov files", "every clip", ...) is left to the model.
+        """
+        detected_files = system_context.get("detected_files_in_directory") or ()
+        return not system_context.get("explicit_input_file") and len(detected_files) > 1
+
+    def _format_system_prompt(self, system_context: dict[str, str], batch_mode: bool = True) -> str:
+        """
+        Formats the system prompt template with the system and file context.
+
+        Args:
+            system_context: Dictionary containing system/environment details.
+            batch_mode: Whether to include the batch/loop rules (otherwise the single-file rule).
+
+        Raises:
+            ValueError: If the system context dictionary is missing required keys.
+            RuntimeError: If the system prompt template was not loaded.
+        """
         # Format the dynamic file context part
         file_context_str = self._format_file_context(system_context)
 
         # Construct the final system prompt
         try:
-            formatted_system_prompt = self.system_prompt_template.format(
+            return self._prompt_templates[batch_mode].format(
                 os_info=system_context.get('os_info', 'Unknown'),
                 os_type=system_context.get('os_type', 'Unknown'),
                 shell=system_context.get('shell', 'Unknown'),
@@ -161,7 +356,7 @@ class CommandGenerator:
                 file_context=file_context_str
             )
         except KeyError as e:
-            log.error(f"Missing key in system_context for prompt formatting: {e}")
+            log.error("Missing key in system_context for prompt formatting: %s", e)
             # Raise a clear ValueError to be handled upstream
             raise ValueError(f"System context dictionary is missing required key: {e}") from e
         except AttributeError:
@@ -169,46 +364,139 @@ class CommandGenerator:
              log.error("System prompt template is not loaded. Cannot format messages.")
              raise RuntimeError("System prompt template failed to load during initialization.")
 
+    def _get_client(self) -> "openai.OpenAI":
+        """Creates the OpenAI client on first use (deferred so startup never pays for it)."""
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(
+                api_key=self.api_key,  # None falls back to the OPENAI_API_KEY env var
+                base_url=self.base_url,  # None uses the OpenAI API
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+            )
+            log.debug("OpenAI client created (timeout: %ss, max_retries: %s)", self.timeout, self.max_retries)
+        return self._client
 
-        messages = [{"role": "system", "content": formatted_system_prompt}]
-        # Filter out empty user messages if any crept in
-        valid_history = [msg for msg in conversation_history if msg.get("content")]
-        messages.extend(valid_history) # Add user prompts, assistant responses, errors etc.
+    def _try_local_draft(self, messages: list[dict[str, str]], system_context: dict[str, str]) -> Optional[LLMCommand]:
+        """
+        Asks the local draft model for the command.
 
-        return messages
+        Returns:
+            The parsed LLMCommand if the draft is a single command that runs ffmpeg itself,
+            otherwise None (including when the local server is unreachable) so the caller
+            can fall back.
+        """
+        import openai
 
-    def _call_llm_api(self, messages: list[dict[str, str]]) -> str:
+        if self._draft_client is None:
+            # No retries: fail over to the main model fast
+            self._draft_client = openai.OpenAI(
+                api_key=LOCAL_LLM_API_KEY, base_url=self.draft_base_url, timeout=self.draft_timeout, max_retries=0
+            )
+        try:
+            response = self._draft_client.chat.completions.create(
+                model=self.draft_model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_object"},
+            )
+        except openai.APIError as e:
+            log.info("Local draft model '%s' unavailable (%s); using %s.", self.draft_model, e, self.model)
+            return None
+        if not response.choices:
+            log.info("Local draft rejected: empty response; using %s.", self.model)
+            return None
+        content = response.choices[0].message.content or ""
+        truncated = response.choices[0].finish_reason == "length"
+
+        parser = StreamingJsonParser()
+        parser.feed(content)
+        try:
+            llm_command = self._to_llm_command(parser, truncated)
+        except InvalidResponseError:
+            log.info("Local draft rejected: response was not valid JSON; using %s.", self.model)
+            return None
+        # Only a single plain ffmpeg invocation is trusted from the small model: anything the
+        # executor would hand to a shell (loops, ;, &&, pipes, redirects, $VARs) goes to the main model
+        if llm_command.commands or SHELL_SYNTAX_RE.search(llm_command.command):
+            log.info("Local draft rejected: command needs a shell; using %s.", self.model)
+            return None
+        try:
+            tokens = shlex.split(llm_command.command)
+        except ValueError:
+            tokens = []
+        # The program itself must be ffmpeg
+        ffmpeg_names = {"ffmpeg", "ffmpeg.exe", os.path.basename(system_context.get("ffmpeg_executable_path") or "ffmpeg")}
+        if not tokens or os.path.basename(tokens[0]) not in ffmpeg_names:
+            log.info("Local draft rejected: not a plain ffmpeg command; using %s.", self.model)
+            return None
+        log.info("Local draft from '%s' accepted (no cloud API call).", self.draft_model)
+        return llm_command
+
+    @property
+    def _last_finish_reason(self) -> Optional[str]:
+        """finish_reason of the last response streamed by _call_llm_api() on this thread."""
+        return getattr(self._thread_state, "finish_reason", None)
+
+    def _throttle(self) -> None:
+        """Sleeps until at least min_interval_s after the previous API call's start (thread-safe)."""
+        with self._throttle_lock:
+            now = time.monotonic()
+            start = now if self._last_call_ts is None else max(now, self._last_call_ts + self.min_interval_s)
+            self._last_call_ts = start  # Reserve the slot, so concurrent callers queue up behind it
+        if start > now:
+            log.debug("Throttling LLM call for %.2fs", start - now)
+            time.sleep(start - now)
+
+    def _call_llm_api(
+        self, messages: list[dict[str, str]], max_tokens: Optional[int] = None, temperature: Optional[float] = None
+    ) -> Generator[str, None, None]:
         """
-        Calls the OpenAI Chat Completion API.
+        Calls the OpenAI Chat Completion API with streaming enabled.
 
         Args:
             messages: The list of messages formatted for the API.
+            max_tokens: Completion budget for this call (defaults to self.max_tokens).
+            temperature: Sampling temperature for this call (defaults to self.temperature).
 
-        Returns:
-            The raw content string from the LLM response.
+        Yields:
+            Content deltas from the LLM response as they arrive. The finish_reason (e.g.
+            "length" when max_tokens cut the response off) is left in self._last_finish_reason
+            for the calling thread.
 
         Raises:
             openai.* errors: Propagates API-specific errors for handling upstream.
             Exception: Catches and re-raises unexpected errors during the API call.
         """
-        log.debug(f"Sending messages to LLM (model: {self.model}): {json.dumps(messages, indent=2)}")
+        # Serializing the whole conversation is only worth it when DEBUG output is actually emitted
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Sending messages to LLM (model: %s): %s", self.model, json_stream.dumps(messages, indent=True))
+        client = self._get_client()
+        self._throttle()
+        self._thread_state.finish_reason = None
         try:
-            # NOTE: Assumes openai.api_key is set globally in the main application
-            response = openai.chat.completions.create(
+            response = client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=self.temperature,
-                response_format={"type": "json_object"} # Request JSON output
+                temperature=self.temperature if temperature is None else temperature,
+                max_tokens=max_tokens or self.max_tokens,
+                response_format={"type": "json_object"}, # Request JSON output
+                stream=True
             )
-            content = response.choices[0].message.content
-            log.debug(f"LLM raw choice content: {content}")
-
-            if not content:
-                log.warning("LLM returned empty content.")
-                # Return structure indicating failure but parsable by clean_json_response/json.loads
-                return json.dumps({"explanation": ["LLM returned empty content."], "command": ""})
-
-            return content
+            try:
+                for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.finish_reason:
+                        self._thread_state.finish_reason = choice.finish_reason
+                    delta = choice.delta.content
+                    if delta:
+                        yield delta
+            finally:
+                # Release the HTTP connection even when the caller stops reading early
+                response.close()
 
         # Specific OpenAI errors are NOT caught here - they will propagate up
         # to be handled by the main application logic (e.g., toast.py)
@@ -218,79 +506,291 @@ class CommandGenerator:
             raise # Re-raise the exception to be handled upstream
 
 
-    def clean_json_response(self, response_str: str) -> str:
+    @staticmethod
+    def _salvage_command(parser: StreamingJsonParser) -> Optional[dict]:
         """
-        Cleans common markdown formatting issues around JSON responses from LLMs.
-        Attempts to extract the outermost JSON object. Robustly handles variations.
+        Recovers the root-level "command" of a response that isn't valid JSON, or returns None.
+
+        Only the value of the root object's own "command" key is considered (never a nested
+        one), decoded leniently so a typical bad escape such as "\\$f" doesn't cost a re-ask.
+        Every other root field that did decode is kept.
+        """
+        command = json_stream.loads_string_lenient(parser.raw_fields.get("command", ""))
+        if not command or not command.strip():
+            return None
+        response_obj = dict(parser.fields)
+        response_obj["command"] = command
+        response_obj.setdefault("explanation", ["(Explanation unavailable: the LLM response was not valid JSON.)"])
+        return response_obj
+
+    def _to_llm_command(self, parser: StreamingJsonParser, truncated: bool = False) -> LLMCommand:
+        """
+        Builds an LLMCommand from a fed parser, reusing its already-decoded fields so the
+        JSON is parsed only once.
+
+        Only a root object that closed in the original text is accepted: a response cut off
+        mid-command must never be executed, so it is rejected for a re-ask instead.
 
         Args:
-            response_str: The raw string response from the LLM.
+            parser: Parser fed with the whole response.
+            truncated: Whether the API reported the response as cut off (finish_reason "length").
 
-        Returns:
-            A string potentially containing a clean JSON object, or the original
-            string if cleaning fails. JSON validity is checked later.
+        Raises:
+            InvalidResponseError: If the response was cut off or contains no JSON object.
         """
-        if not isinstance(response_str, str):
-             log.warning(f"clean_json_response received non-string input: {type(response_str)}")
-             return "" # Return empty string for non-string input
+        content = parser.get()
+        log.debug("LLM raw choice content: %s", content)
+        if truncated or not parser.complete:
+            reason = "was cut off at the token limit" if truncated else "contains no complete JSON object"
+            raise InvalidResponseError(f"LLM response {reason}.", content)
+
+        response_obj: Any = parser.fields
+        if "command" not in response_obj:
+            # Either the object really has no command, or its value failed to decode (e.g. a
+            # bad escape); in the latter case the string may still be recoverable
+            try:
+                response_obj = json_stream.loads(content)
+            except ValueError as e:
+                response_obj = self._salvage_command(parser)
+                if response_obj is None:
+                    raise InvalidResponseError(f"LLM response is not valid JSON: {e}", content) from e
+                log.warning("LLM response was not valid JSON; recovered its \"command\" field without a retry.")
+                content = json_stream.dumps(response_obj)  # Keep valid JSON in the conversation history
+        return self._build_llm_command(response_obj, content)
+
+    @staticmethod
+    def _build_llm_command(response_obj: dict, raw: str) -> LLMCommand:
+        """Normalizes the fields of a decoded response object into an LLMCommand."""
+        explanation = response_obj.get("explanation") or []
+        command = response_obj.get("command") or ""
+        commands = response_obj.get("commands") or []
+        if not isinstance(commands, list):
+            commands = []
+        return LLMCommand(
+            explanation=explanation if isinstance(explanation, (list, str)) else str(explanation),
+            command=str(command).strip(),
+            commands=[str(cmd).strip() for cmd in commands if cmd and str(cmd).strip()],
+            raw=raw,
+        )
+
+    def generate_command_stream(
+        self,
+        conversation_history: list[dict[str, str]],
+        system_context: dict[str, str],
+        temperature: Optional[float] = None,
+    ) -> Generator[Tuple[str, Any], None, LLMCommand]:
+        """
+        Streams the LLM response, yielding each top-level JSON field as soon as it completes.
 
-        response_str = response_str.strip()
+        Lets a caller act on "command" while "explanation" is still being generated. Reading
+        stops as soon as the root JSON object closes.
 
-        # 1. Remove markdown code blocks (```json ... ``` or ``` ... ```)
-        # Using DOTALL to match across newlines, IGNORECASE for 'json' tag
-        match = re.match(r"^\s*```(?:json)?\s*(.*)\s*```\s*$", response_str, re.DOTALL | re.IGNORECASE)
-        if match:
-             response_str = match.group(1).strip()
+        Args:
+            conversation_history: The history of the conversation (user prompts, prior results/errors).
+            system_context: Dictionary containing system, file, and environment details.
+            temperature: Overrides the sampling temperature for this request (e.g. to move a
+                retry away from a repeated answer).
 
-        # 2. Find the first '{' and the last '}' to define the JSON boundaries
-        # This helps trim potential leading/trailing non-JSON text LLMs sometimes add
-        try:
-            start_index = response_str.index("{")
-            end_index = response_str.rindex("}") + 1
-            response_str = response_str[start_index:end_index]
-        except ValueError:
-            # If no '{' or '}' found, it's likely not a valid JSON object string.
-            log.warning("Could not find JSON object boundaries '{...}' in LLM response after cleaning markdown.")
-            # Return the processed string; parsing will fail later if it's not JSON.
-            return response_str
+        Yields:
+            (field_name, value) tuples, e.g. ("command", "ffmpeg -i ...").
 
-        # 3. Optional: Further cleaning (e.g., removing trailing commas) could be added here,
-        # but standard json.loads often handles minor issues. Rely on it for validation.
+        Returns:
+            The parsed LLMCommand (as the generator's StopIteration value). Fields already
+            yielded from a response that then turns out to be cut off are not in it: the
+            response is rejected with InvalidResponseError.
+
+        Raises:
+            Same as generate_command().
+        """
+        user_turns = [msg.get("content", "") for msg in conversation_history if msg.get("role") == "user"]
+        if self.local_routing and len(user_turns) == 1:
+            routed = route_locally(user_turns[0], system_context)
+            if routed is not None:
+                log.info("Request matched a local template (no API call).")
+                self._request_cache_key = None  # Nothing to gain from caching a template
+                explanation, command = routed
+                yield "explanation", explanation
+                yield "command", command
+                return LLMCommand(
+                    explanation=explanation,
+                    command=command,
+                    commands=[],
+                    raw=json_stream.dumps({"explanation": explanation, "command": command}),
+                )
+
+        messages = self._prepare_llm_messages(conversation_history, system_context)
 
-        return response_str
+        if self.response_cache is not None:
+            # Key on the original request only (system prompt + first user message), so a
+            # response that worked after retries is what a repeat of the request gets back.
+            user_messages = [msg["content"] for msg in messages if msg.get("role") == "user"]
+            self._request_cache_key = ResponseCache.make_key(
+                self.model, self.temperature, messages[0]["content"], [_normalize_query(q) for q in user_messages[:1]]
+            )
+            if len(user_messages) == 1:
+                cached = self.response_cache.get(self._request_cache_key)
+                if cached is not None:
+                    log.info("Using cached LLM response for this request (no API call).")
+                    parser = StreamingJsonParser()
+                    yield from parser.feed(cached)
+                    return self._to_llm_command(parser)
+
+        if self.draft_model and sum(1 for msg in messages if msg.get("role") == "user") == 1:
+            draft = self._try_local_draft(messages, system_context)
+            if draft is not None:
+                self._request_cache_key = None  # The cache key is the main model's; don't file a draft under it
+                yield "explanation", draft.explanation
+                yield "command", draft.command
+                return draft
+
+        parser = StreamingJsonParser()
+        received_content = False
+        deltas = self._call_llm_api(messages, temperature=temperature)
+        try:
+            for delta in deltas:
+                received_content = True
+                yield from parser.feed(delta)
+                if parser.complete:
+                    break
+        finally:
+            deltas.close()
+
+        if not received_content:
+            log.warning("LLM returned empty content.")
+            explanation = ["LLM returned empty content."]
+            return LLMCommand(
+                explanation=explanation,
+                command="",
+                commands=[],
+                raw=json_stream.dumps({"explanation": explanation, "command": ""}),
+            )
 
+        return self._to_llm_command(parser, truncated=self._last_finish_reason == "length")
 
-    def generate_command(self, conversation_history: list[dict[str, str]], system_context: dict[str, str]) -> str:
+
+    def generate_command(
+        self,
+        conversation_history: list[dict[str, str]],
+        system_context: dict[str, str],
+        temperature: Optional[float] = None,
+    ) -> LLMCommand:
         """
-        Generates the FFmpeg command JSON string using the LLM.
+        Generates the FFmpeg command using the LLM.
 
-        Orchestrates the process: prepares messages, calls the API, and returns
-        the raw JSON content string. Expects caller to handle API errors & parse JSON.
+        Orchestrates the process: prepares messages, streams the API response, and parses it
+        once into an LLMCommand. Expects caller to handle API errors.
 
         Args:
             conversation_history: The history of the conversation (user prompts, prior results/errors).
             system_context: Dictionary containing system, file, and environment details.
+            temperature: Overrides the sampling temperature for this request.
 
         Returns:
-            A raw string potentially containing the JSON response from the LLM.
-            This string should be cleaned and parsed by the caller.
+            The parsed LLMCommand (explanation, command, and the raw JSON text for history).
 
         Raises:
+            InvalidResponseError: If the LLM response contains no usable JSON object.
             ValueError: If system context is missing required keys for prompt formatting.
             openai.* errors: Propagates API-specific errors from the API call.
             Exception: Propagates unexpected errors from API call or message prep.
             FileNotFoundError: If the system prompt template file cannot be loaded.
             RuntimeError: If the system prompt template was not loaded during init.
         """
-        # 1. Prepare messages using helper methods
-        # Raises ValueError if system_context keys are missing
-        # Raises RuntimeError if system_prompt_template isn't loaded
-        messages = self._prepare_llm_messages(conversation_history, system_context)
+        # Drain the streaming variant; its return value is the parsed command
+        stream = self.generate_command_stream(conversation_history, system_context, temperature)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as stop:
+                return stop.value
+
+    def generate_commands_for_prompts(self, prompts: List[str], system_context: dict[str, str]) -> List[LLMCommand]:
+        """
+        Generates one command per prompt, with as few LLM requests as possible.
 
-        # 2. Call the LLM API using a helper method
-        # This call can raise various openai.* errors or other exceptions,
-        # which are intentionally *not* caught here but propagated upwards.
-        raw_llm_response = self._call_llm_api(messages)
+        The prompts are sent as numbered user messages, so the system prompt and the request
+        overhead are paid once per group instead of once per prompt. Each group gets
+        max_tokens per prompt, and groups are sized so a request never asks for more than
+        MAX_BATCH_COMPLETION_TOKENS. Several groups are sent concurrently, at most
+        MAX_CONCURRENT_BATCH_REQUESTS at a time (still spaced by min_interval_s).
 
-        # 3. Return the raw response string (caller will clean and parse)
-        return raw_llm_response
\ No newline at end of file
+        Args:
+            prompts: Natural-language user prompts, handled independently of each other.
+            system_context: Dictionary containing system, file, and environment details.
+
+        Returns:
+            One LLMCommand per prompt, in the same order. Each `raw` holds that prompt's own
+            JSON object, so it can seed a follow-up conversation.
+
+        Raises:
+            InvalidResponseError: If a response is cut off or is not a JSON object with one
+                                  result per prompt.
+            ValueError: If system context is missing required keys for prompt formatting.
+            openai.* errors: Propagates API-specific errors from the API call.
+        """
+        group_size = max(1, MAX_BATCH_COMPLETION_TOKENS // self.max_tokens)
+        groups = [prompts[start:start + group_size] for start in range(0, len(prompts), group_size)]
+        # Formatted once here: the prompt cache and the lazily created client aren't shared
+        # safely between the worker threads below
+        system_messages = self._prepare_llm_messages([], system_context)
+        if len(groups) == 1:
+            return self._generate_prompt_group(groups[0], system_messages)
+        self._get_client()
+        log.debug("Generating commands for %s prompts in %s concurrent requests", len(prompts), len(groups))
+        # Imported here: asyncio is a sizeable share of CLI start-up and only batches need it
+        import asyncio
+
+        results = asyncio.run(self._generate_prompt_groups(groups, system_messages))
+        return [llm_command for group_commands in results for llm_command in group_commands]
+
+    async def _generate_prompt_groups(
+        self, groups: List[List[str]], system_messages: list[dict[str, str]]
+    ) -> List[List[LLMCommand]]:
+        """Runs _generate_prompt_group() for every group on worker threads, bounded by a semaphore."""
+        import asyncio
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCH_REQUESTS)
+
+        async def run_one(group: List[str]) -> List[LLMCommand]:
+            async with semaphore:
+                return await asyncio.to_thread(self._generate_prompt_group, group, system_messages)
+
+        return await asyncio.gather(*(run_one(group) for group in groups))
+
+    def _generate_prompt_group(self, prompts: List[str], system_messages: list[dict[str, str]]) -> List[LLMCommand]:
+        """Sends one group of generate_commands_for_prompts() as a single request."""
+        numbered_prompts = "\n".join(f"{i}. {prompt}" for i, prompt in enumerate(prompts, 1))
+        # The result schema goes in the user message so the system prompt (and the API's
+        # prompt cache for it) stays identical to single-request runs
+        messages = [*system_messages, {"role": "user", "content": PROMPT_LIST_INSTRUCTIONS + numbered_prompts}]
+        content = "".join(self._call_llm_api(messages, max_tokens=self.max_tokens * len(prompts)))
+        log.debug("LLM raw batch content: %s", content)
+        if self._last_finish_reason == "length":
+            raise InvalidResponseError("LLM response was cut off at the token limit.", content)
+        # JSON mode makes this the bare object; a local server ignoring it may add a fence or prose
+        json_object = extract_json_object(content)
+        if json_object is None:
+            raise InvalidResponseError("LLM response contains no complete JSON object.", content)
+        try:
+            response_obj = json_stream.loads(json_object)
+        except ValueError as e:
+            raise InvalidResponseError(f"LLM response is not valid JSON: {e}", content) from e
+
+        results = response_obj.get("results") if isinstance(response_obj, dict) else None
+        if not isinstance(results, list) or len(results) != len(prompts):
+            raise InvalidResponseError(f"Expected a \"results\" list with {len(prompts)} entries.", content)
+        # A malformed entry becomes an empty command rather than failing the whole batch
+        return [
+            self._build_llm_command(result if isinstance(result, dict) else {}, json_stream.dumps(result))
+            for result in results
+        ]
+
+    def remember_successful_response(self, llm_command: LLMCommand) -> None:
+        """
+        Caches a response whose command executed successfully under the key of the
+        conversation's original request. Only working commands are ever served from cache.
+        """
+        if self.response_cache is None or self._request_cache_key is None:
+            return
+        self.response_cache.put(self._request_cache_key, llm_command.raw)
+        log.debug("Cached successful LLM response under key %s...", self._request_cache_key[:12])
@@ -19,9 +19,28 @@ else:
 CONFIG_FILE_PATH = CONFIG_DIR / "config.json"
 LOG_FILE_PATH = CONFIG_DIR / "toast.log"  # Centralized log file location
 
+# Disposable cached data (safe to delete) goes under the XDG cache dir: ~/.cache/pixel-toaster
+XDG_CACHE_HOME = os.environ.get('XDG_CACHE_HOME')
+if XDG_CACHE_HOME and os.path.isdir(XDG_CACHE_HOME):
+    CACHE_DIR = Path(XDG_CACHE_HOME) / "pixel-toaster"
+else:
+    CACHE_DIR = Path.home() / ".cache" / "pixel-toaster"
+
+FFMPEG_VERSION_CACHE_PATH = CACHE_DIR / "ffmpeg_version.json"
+LLM_CACHE_PATH = CACHE_DIR / "llm_cache.sqlite"
+
 DEFAULT_CONFIG = {
     "openai_api_key": None,
     "llm_model": "gpt-4o-mini",  # Default model
+    "llm_timeout": 20,  # Seconds before an LLM request is abandoned
+    "llm_max_retries": 2,  # Client-side retries on transient API errors
+    "llm_max_tokens": 512,  # Cap on generated tokens per response
+    "llm_cache_enabled": True,  # Reuse the last working response for an identical request
+    "llm_cache_ttl_days": 7,  # Age after which cached responses are discarded
+    "local_intents_enabled": True,  # Handle plain conversions ("convert x.mov to mp4") without the LLM
+    "local_llm_model": None,  # e.g. "qwen2.5-coder:1.5b" served by Ollama; tried before the cloud model
+    "local_llm_base_url": "http://localhost:11434/v1",  # OpenAI-compatible endpoint of the local server
+    "local_llm_timeout": 30,  # Seconds to wait for the local model before falling back
     "log_level": "INFO",
     "log_to_file": True,
     # Add other future config options here with defaults
@@ -30,11 +49,15 @@ DEFAULT_CONFIG = {
 
 log = log.getLogger(__name__)  # Use module-specific logger
 
-def load_config() -> Dict[str, Any]:
+def load_config(require_api_key: bool = True) -> Dict[str, Any]:
     """
     Loads configuration from the JSON file. If the file doesn't exist
     or is invalid, it triggers the initialization process.
     Returns the loaded (or initialized) configuration dictionary.
+
+    With require_api_key=False (e.g. --local-only runs, which never call the OpenAI API)
+    a missing key or config file is not an error: the defaults are used and first-time
+    setup is not started.
     """
     if CONFIG_FILE_PATH.is_file():
         try:
@@ -46,16 +69,16 @@ def load_config() -> Dict[str, Any]:
             config.update(user_config)
 
             # --- Validation ---
-            if not config.get("openai_api_key"):
-                log.warning(f"OpenAI API key missing in config file: {CONFIG_FILE_PATH}")
+            if require_api_key and not config.get("openai_api_key"):
+                log.warning("OpenAI API key missing in config file: %s", CONFIG_FILE_PATH)
                 print(f"[WARNING] OpenAI API key not found in {CONFIG_FILE_PATH}.")
                 return initialize_config()  # Re-initialize if key is missing
 
-            log.info(f"Configuration loaded successfully from {CONFIG_FILE_PATH}")
+            log.info("Configuration loaded successfully from %s", CONFIG_FILE_PATH)
             return config
 
         except json.JSONDecodeError:
-            log.error(f"Invalid JSON format in config file: {CONFIG_FILE_PATH}", exc_info=VERBOSE)
+            log.error("Invalid JSON format in config file: %s", CONFIG_FILE_PATH, exc_info=VERBOSE)
             print(f"[ERROR] Corrupted configuration file found at {CONFIG_FILE_PATH}.")
             print("Please fix or delete the file and run again.")
             # Optionally: backup the corrupted file before prompting initialization
@@ -63,11 +86,14 @@ def load_config() -> Dict[str, Any]:
             # return initialize_config() # Or force exit
             raise SystemExit(1)  # Exit if config is corrupted
         except Exception as e:
-            log.error(f"Error loading config file {CONFIG_FILE_PATH}: {e}", exc_info=VERBOSE)
+            log.error("Error loading config file %s: %s", CONFIG_FILE_PATH, e, exc_info=VERBOSE)
             print(f"[ERROR] Could not read configuration file: {e}")
             raise SystemExit(1)
+    elif not require_api_key:
+        log.info("Configuration file not found at %s. Using defaults.", CONFIG_FILE_PATH)
+        return DEFAULT_CONFIG.copy()
     else:
-        log.info(f"Configuration file not found at {CONFIG_FILE_PATH}. Starting initialization.")
+        log.info("Configuration file not found at %s. Starting initialization.", CONFIG_FILE_PATH)
         return initialize_config()
 
 def initialize_config() -> Dict[str, Any]:
@@ -95,9 +121,9 @@ def initialize_config() -> Dict[str, Any]:
     try:
         # Ensure the directory exists
         CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-        log.info(f"Created configuration directory: {CONFIG_DIR}")
+        log.info("Created configuration directory: %s", CONFIG_DIR)
     except OSError as e:
-        log.error(f"Failed to create configuration directory {CONFIG_DIR}: {e}", exc_info=VERBOSE)
+        log.error("Failed to create configuration directory %s: %s", CONFIG_DIR, e, exc_info=VERBOSE)
         print(f"[ERROR] Could not create configuration directory: {e}")
         raise SystemExit(1)
 
@@ -107,11 +133,11 @@ def initialize_config() -> Dict[str, Any]:
             json.dump(new_config, f, indent=4)
         # Secure the file permissions (optional but recommended for files with secrets)
         # os.chmod(CONFIG_FILE_PATH, 0o600) # Read/write only for owner
-        log.info(f"Configuration saved successfully to {CONFIG_FILE_PATH}")
+        log.info("Configuration saved successfully to %s", CONFIG_FILE_PATH)
         print("Configuration saved successfully.")
         return new_config
     except IOError as e:
-        log.error(f"Failed to save configuration file {CONFIG_FILE_PATH}: {e}", exc_info=VERBOSE)
+        log.error("Failed to save configuration file %s: %s", CONFIG_FILE_PATH, e, exc_info=VERBOSE)
         print(f"[ERROR] Could not write configuration file: {e}")
         raise SystemExit(1)
 
@@ -123,5 +149,5 @@ def get_config_value(key: str, default: Optional[Any] = None) -> Any:
         config = load_config()  # Simple approach: load each time needed (cached if module loaded)
         return config.get(key, default)
     except Exception:
-        log.error(f"Failed to load config to get key '{key}'. Returning default.", exc_info=VERBOSE)
+        log.error("Failed to load config to get key '%s'. Returning default.", key, exc_info=VERBOSE)
         return default
\ No newline at end of file
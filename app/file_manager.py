@@ -1,25 +1,77 @@
 import os
 import re
 import logging as log
-from typing import List, Optional, Set
+from collections import OrderedDict
+from typing import AbstractSet, Iterator, List, Optional, Tuple
 
 # Supported file extensions
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".gif"}
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".heic"}
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".aac", ".flac"}
 
-# Combine all extensions into one set for unified regex generation
-ALL_EXTENSIONS = VIDEO_EXTENSIONS | IMAGE_EXTENSIONS | AUDIO_EXTENSIONS
+# Combine all extensions into one set for unified regex generation and media filtering.
+# Built (and lowercased, to match the lowercased names in the directory snapshot) once at import.
+ALL_EXTENSIONS = frozenset(ext.lower() for ext in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS | AUDIO_EXTENSIONS)
 
 # Generate a regex pattern from the supported extensions (removing the dot)
 ext_pattern = '|'.join(re.escape(ext.lstrip('.')) for ext in ALL_EXTENSIONS)
 
+# Precompiled once at import; extract_explicit_filename runs them on every query.
+# Quoted filenames (e.g. "my clip.mp4") and unquoted ones (more restrictive characters) are
+# matched by one alternation, so the query is scanned once for both.
+FILENAME_RE = re.compile(
+    rf'["\'](?P<quoted>[^"\']+\.(?:{ext_pattern}))["\']'
+    rf'|\b(?P<unquoted>[a-zA-Z0-9_.-]+\.(?:{ext_pattern}))\b',
+    re.IGNORECASE,
+)
+TOKEN_RE = re.compile(r'\b[\w.-]{3,}\b')  # Words >= 3 chars
+
+# Directory snapshots shared by every FileManager in the process (e.g. repeated runs from one
+# session): abs directory -> (st_mtime_ns, [(full_path, name_lower, ext_lower), ...]).
+# An entry is reused until the directory's mtime changes (entries added/removed/renamed).
+SNAPSHOT_CACHE_SIZE = 32
+_snapshot_cache: "OrderedDict[str, Tuple[int, List[Tuple[str, str, str]]]]" = OrderedDict()
+
+def _extension(name: str) -> str:
+    """
+    Returns the extension of a bare file name including the dot (e.g. '.mp4'), or ''.
+    Same result as os.path.splitext(name)[1] for names without a directory part (leading
+    dots don't start an extension), but a single rpartition instead of the path parsing.
+    """
+    head, dot, ext = name.rpartition(".")
+    return dot + ext if head.strip(".") else ""
+
 class FileManager:
     def __init__(self, directory: str = ".", verbose: bool = False):
         self.directory = os.path.abspath(directory)  # Use absolute path
         self.verbose = verbose
-        if not os.path.isdir(self.directory):
-            log.warning(f"Target directory does not exist: {self.directory}. File listing might be empty.")
+        # Checked once: a missing directory is reported here and skipped (no I/O) afterwards
+        self._exists = os.path.isdir(self.directory)
+        if not self._exists:
+            log.warning("Target directory does not exist: %s. File listing might be empty.", self.directory)
+
+    def _snapshot(self) -> List[Tuple[str, str, str]]:
+        """
+        Returns (full_path, name_lower, ext_lower) for every regular file in the directory.
+        The scandir result is reused until the directory's mtime changes (entries added/removed/renamed).
+        Raises OSError (e.g. FileNotFoundError) if the directory can't be read.
+        """
+        mtime_ns = os.stat(self.directory).st_mtime_ns
+        cached = _snapshot_cache.get(self.directory)
+        if cached is not None and cached[0] == mtime_ns:
+            _snapshot_cache.move_to_end(self.directory)
+            return cached[1]
+        with os.scandir(self.directory) as entries:
+            files = []
+            for entry in entries:
+                if entry.is_file():
+                    name_lower = entry.name.lower()
+                    files.append((entry.path, name_lower, _extension(name_lower)))
+        _snapshot_cache[self.directory] = (mtime_ns, files)
+        _snapshot_cache.move_to_end(self.directory)
+        if len(_snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+            _snapshot_cache.popitem(last=False)
+        return files
 
     def extract_explicit_filename(self, user_query: str) -> Optional[str]:
         """
@@ -27,64 +79,96 @@ class FileManager:
         This is a simple check and might need refinement based on edge cases.
         It prioritizes filenames with extensions.
         """
-        # Regex to find quoted filenames (e.g., "filename.mp4")
-        quoted_pattern = rf'["\']([^"\']+\.({ext_pattern}))["\']'
-        quoted_matches = re.findall(quoted_pattern, user_query, re.IGNORECASE)
+        # Every path below needs a "name.ext" in the query (media files all have extensions),
+        # so a query without a dot can't name a file: skip the regexes and the directory scan.
+        if "." not in user_query:
+            return None
+
+        # Build the lowercase name -> full path lookup once; every check below is a dict hit, not a stat
+        local_media_files = {}
+        try:
+            if self._exists:
+                local_media_files = {
+                    name_lower: path
+                    for path, name_lower, ext in self._snapshot()
+                    if ext in ALL_EXTENSIONS
+                }
+        except Exception as e:
+            log.error("Error listing files for explicit file matching: %s", e, exc_info=self.verbose)
+            local_media_files = {}
+
+        def find_local(fname: str) -> Optional[str]:
+            if os.path.dirname(fname):
+                # Relative/absolute paths point outside the snapshot; check them directly
+                potential_file = os.path.join(self.directory, fname)
+                return potential_file if os.path.isfile(potential_file) else None
+            return local_media_files.get(fname.lower())
+
+        quoted_matches = []
+        unquoted_matches = []
+        for match in FILENAME_RE.finditer(user_query):
+            if match["quoted"]:
+                quoted_matches.append(match["quoted"])
+            else:
+                unquoted_matches.append(match["unquoted"])
+
+        # Quoted filenames (e.g., "filename.mp4") take priority
         if quoted_matches:
-            # re.findall returns a list of tuples (filename, extension)
-            potential_filename = quoted_matches[0][0]
-            potential_file = os.path.join(self.directory, potential_filename)
-            if os.path.isfile(potential_file):
+            potential_filename = quoted_matches[0]
+            potential_file = find_local(potential_filename)
+            if potential_file:
                 return potential_file  # Return full path
             else:
-                log.debug(f"Found quoted potential filename '{potential_filename}' in query, but it doesn't exist locally.")
+                log.debug("Found quoted potential filename '%s' in query, but it doesn't exist locally.", potential_filename)
 
-        # Regex to find unquoted filenames (more restrictive characters)
-        unquoted_pattern = rf'\b([a-zA-Z0-9_.-]+\.({ext_pattern}))\b'
-        unquoted_matches = re.findall(unquoted_pattern, user_query, re.IGNORECASE)
+        # Unquoted filenames (more restrictive characters)
         if unquoted_matches:
-            for match in unquoted_matches:
-                fname = match[0]  # The full filename
-                potential_file = os.path.join(self.directory, fname)
-                if os.path.isfile(potential_file):
+            for fname in unquoted_matches:
+                potential_file = find_local(fname)
+                if potential_file:
                     return potential_file  # Return full path
-            log.debug(f"Found unquoted potential filenames {[match[0] for match in unquoted_matches]} in query, but none exist locally.")
+            log.debug("Found unquoted potential filenames %s in query, but none exist locally.", unquoted_matches)
 
         # Basic check: if a token *exactly* matches an existing file (case-insensitive)
-        tokens = re.findall(r'\b[\w.-]{3,}\b', user_query)  # Find words >= 3 chars
-        try:
-            local_files = {
-                f.lower(): f
-                for f in os.listdir(self.directory)
-                if os.path.isfile(os.path.join(self.directory, f))
-            }
-            for token in tokens:
-                if token.lower() in local_files:
-                    _, ext = os.path.splitext(local_files[token.lower()])
-                    if ext.lower() in ALL_EXTENSIONS:
-                        return os.path.join(self.directory, local_files[token.lower()])  # Return full path
-        except FileNotFoundError:
-            log.warning(f"Directory not found when checking tokens: {self.directory}", exc_info=self.verbose)
-        except Exception as e:
-            log.error(f"Error during token matching: {e}", exc_info=self.verbose)
+        for token in TOKEN_RE.findall(user_query):
+            found = local_media_files.get(token.lower())
+            if found:
+                return found  # Return full path
 
         return None  # No explicit file found and verified
 
-    def list_files(self, exts: Set[str]) -> List[str]:
+    def list_files(self, exts: AbstractSet[str]) -> List[str]:
         """
         List files in the directory that match any of the extensions.
         Returns a list of full paths.
         """
+        if not self._exists:
+            return []
         matches = []
         try:
-            for f in os.listdir(self.directory):
-                full_path = os.path.join(self.directory, f)
-                if os.path.isfile(full_path):
-                    _, ext = os.path.splitext(f)
-                    if ext.lower() in exts:
-                        matches.append(full_path)  # Append full path
-        except FileNotFoundError:
-            log.warning(f"Directory not found for listing files: {self.directory}", exc_info=self.verbose)
+            matches = [path for path, _, ext in self._snapshot() if ext in exts]  # Full paths
+        except Exception as e:
+            log.error("Error listing files in %s: %s", self.directory, e, exc_info=self.verbose)
+        return matches
+
+    def iter_files(self, exts: AbstractSet[str]) -> Iterator[str]:
+        """
+        Yield full paths of files in the directory that match any of the extensions.
+        Reuses the cached snapshot when it is current; otherwise scans lazily, so a
+        caller that stops early (e.g. via itertools.islice) also stops the scan.
+        """
+        if not self._exists:
+            return
+        try:
+            cached = _snapshot_cache.get(self.directory)
+            if cached is not None and cached[0] == os.stat(self.directory).st_mtime_ns:
+                for path, _, ext in cached[1]:
+                    if ext in exts:
+                        yield path
+                return
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if _extension(entry.name).lower() in exts and entry.is_file():
+                        yield entry.path
         except Exception as e:
-            log.error(f"Error listing files in {self.directory}: {e}", exc_info=self.verbose)
-        return matches
\ No newline at end of file
+            log.error("Error listing files in %s: %s", self.directory, e, exc_info=self.verbose)
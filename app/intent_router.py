@@ -0,0 +1,117 @@
+import os
+import re
+import shlex
+import logging as log
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .file_manager import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+log = log.getLogger(__name__)
+
+# H.264 needs even dimensions, and most players only decode its 4:2:0 chroma; sources such as
+# GIFs or odd-sized clips get neither by default
+_H264: Tuple[List[str], List[str]] = (
+    ["-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p",
+     "-c:v", "libx264", "-crf", "23", "-preset", "medium", "-c:a", "aac", "-b:a", "128k"],
+    ["-vf scale=trunc(iw/2)*2:trunc(ih/2)*2: round odd frame sizes down to even, as H.264 requires",
+     "-pix_fmt yuv420p: use the 4:2:0 pixel format that players widely support",
+     "-c:v libx264 -crf 23 -preset medium: re-encode video as H.264 at good quality",
+     "-c:a aac -b:a 128k: encode audio as AAC at 128 kbit/s"],
+)
+
+# (extra ffmpeg arguments, explanation) per target format for a plain conversion
+_CONVERSIONS: Dict[str, Tuple[List[str], List[str]]] = {
+    "mp4": _H264,
+    "mov": _H264,
+    "mkv": _H264,
+    "webm": (["-c:v", "libvpx-vp9", "-crf", "32", "-b:v", "0", "-c:a", "libopus"],
+             ["-c:v libvpx-vp9 -crf 32 -b:v 0: encode video as VP9 in constant-quality mode",
+              "-c:a libopus: encode audio as Opus"]),
+    "gif": (["-vf", "fps=12,scale=480:-1:flags=lanczos,split[a][b];[a]palettegen[p];[b][p]paletteuse", "-loop", "0"],
+            ["-vf fps=12,scale=480:-1:flags=lanczos: 12 frames per second, 480 px wide",
+             "split/palettegen/paletteuse: build an optimized palette for better GIF colors",
+             "-loop 0: loop the GIF forever"]),
+    "mp3": (["-vn", "-c:a", "libmp3lame", "-q:a", "2"],
+            ["-vn: drop any video stream", "-c:a libmp3lame -q:a 2: encode audio as high-quality VBR MP3"]),
+    "wav": (["-vn", "-c:a", "pcm_s16le"],
+            ["-vn: drop any video stream", "-c:a pcm_s16le: write uncompressed 16-bit PCM audio"]),
+    "flac": (["-vn", "-c:a", "flac"],
+             ["-vn: drop any video stream", "-c:a flac: encode audio losslessly as FLAC"]),
+    "aac": (["-vn", "-c:a", "aac", "-b:a", "192k"],
+            ["-vn: drop any video stream", "-c:a aac -b:a 192k: encode audio as AAC at 192 kbit/s"]),
+    "png": ([], ["Output format is chosen from the .png extension"]),
+    "jpg": (["-q:v", "2"], ["-q:v 2: high JPEG quality"]),
+    "webp": (["-c:v", "libwebp", "-quality", "80"], ["-c:v libwebp -quality 80: encode as WebP at quality 80"]),
+}
+_FORMATS = "|".join(_CONVERSIONS)
+
+# Target formats the templates above handle for each kind of input
+_AUDIO_TARGETS = {"mp3", "wav", "flac", "aac"}
+_VIDEO_TARGETS = {"mp4", "mov", "mkv", "webm", "gif"}
+_TARGETS_BY_INPUT = (
+    (VIDEO_EXTENSIONS - {".gif"}, _VIDEO_TARGETS | _AUDIO_TARGETS),
+    ({".gif"}, _VIDEO_TARGETS),  # GIFs have no audio stream to extract
+    (AUDIO_EXTENSIONS, _AUDIO_TARGETS),
+    (IMAGE_EXTENSIONS, {"png", "jpg", "webp"}),
+)
+_FILE = r"""(?P<file>"[^"]+"|'[^']+'|\S+)"""
+
+# Whole-query patterns only: anything beyond a bare conversion ("...and make it smaller")
+# doesn't match and goes to the LLM.
+_INTENTS: List[Tuple[re.Pattern, Callable[[re.Match], str]]] = [
+    (re.compile(rf"(?:please\s+)?(?:convert|transcode|turn|change)\s+{_FILE}\s+(?:to|into)\s+(?:an?\s+)?\.?(?P<fmt>{_FORMATS})(?:\s+(?:file|format|video|audio|image))?",
+                re.IGNORECASE), lambda m: m["fmt"].lower()),
+    (re.compile(rf"(?:please\s+)?(?:make|create)\s+an?\s+(?P<fmt>gif)\s+(?:from|of)\s+{_FILE}", re.IGNORECASE),
+     lambda m: "gif"),
+    (re.compile(rf"(?:please\s+)?(?:extract|get|rip)\s+(?:the\s+)?audio\s+(?:from|of)\s+{_FILE}(?:\s+(?:as|to|into)\s+(?:an?\s+)?\.?(?P<fmt>mp3|wav|flac|aac))?",
+                re.IGNORECASE), lambda m: (m["fmt"] or "mp3").lower()),
+]
+_TRAILING_PUNCT_RE = re.compile(r"[\s.!?]+$")
+
+
+def route_locally(user_query: str, system_context: Dict[str, str]) -> Optional[Tuple[List[str], str]]:
+    """
+    Builds the ffmpeg command for a trivial request without asking the LLM.
+
+    Only a handful of whole-query intents are recognized (plain format conversion, GIF
+    creation, audio extraction), and only when the named file is the verified explicit
+    input file, so anything ambiguous still goes to the LLM.
+
+    Args:
+        user_query: The user's original request.
+        system_context: Dictionary containing system, file, and environment details.
+
+    Returns:
+        (explanation, command) on a match, otherwise None.
+    """
+    input_path = system_context.get("explicit_input_file")
+    if not input_path or system_context.get("os_type") == "Windows":
+        return None  # Commands below are quoted for POSIX shells
+
+    query = _TRAILING_PUNCT_RE.sub("", user_query.strip())
+    for pattern, target in _INTENTS:
+        match = pattern.fullmatch(query)
+        if not match:
+            continue
+        named_file = match["file"].strip("'\"")
+        if os.path.basename(named_file).lower() != os.path.basename(input_path).lower():
+            return None
+        fmt = target(match)
+        stem, ext = os.path.splitext(os.path.basename(input_path))
+        if ext.lower().lstrip(".") == fmt:
+            return None  # Same format in and out: the user wants something the template can't do
+        if not any(ext.lower() in exts and fmt in targets for exts, targets in _TARGETS_BY_INPUT):
+            return None  # e.g. video -> png needs frame selection; leave it to the LLM
+        output_path = os.path.join(system_context.get("current_directory", "."), f"{stem}_toasted.{fmt}")
+        extra_args, extra_explanation = _CONVERSIONS[fmt]
+        ffmpeg = system_context.get("ffmpeg_executable_path") or "ffmpeg"
+        command = shlex.join([ffmpeg, "-i", input_path, *extra_args, output_path, "-y"])
+        explanation = [
+            f"-i {os.path.basename(input_path)}: the input file",
+            *extra_explanation,
+            f"{os.path.basename(output_path)}: output file in the current directory, with the _toasted suffix",
+            "-y: overwrite the output file if it already exists",
+        ]
+        log.debug("Local intent route matched %r -> %s", user_query, command)
+        return explanation, command
+    return None
@@ -0,0 +1,211 @@
+import json
+import logging as log
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson  # Optional: Rust-backed, faster (de)serialization
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+log = log.getLogger(__name__)
+
+
+def loads(text: str) -> Any:
+    """Parses JSON text, using orjson when installed. Raises ValueError (json.JSONDecodeError) on bad input."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Serializes to a JSON string, using orjson when installed. `indent` pretty-prints with 2 spaces."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None)
+
+
+# A JSON string escape that is valid, or a lone backslash (group 1 empty) that makes it invalid
+_STRING_ESCAPE_RE = re.compile(r'\\(["\\/bfnrt]|u[0-9a-fA-F]{4})?')
+
+
+def loads_string_lenient(snippet: str) -> Optional[str]:
+    """
+    Decodes a JSON string literal the way an LLM most likely meant it, or returns None.
+
+    Invalid escapes lose their backslash (a shell-minded "\\$f" becomes "$f") and raw
+    control characters such as newlines are allowed; valid escapes decode as usual.
+    """
+    if len(snippet) < 2 or snippet[0] != '"' or snippet[-1] != '"':
+        return None
+    fixed = _STRING_ESCAPE_RE.sub(lambda m: m.group(0) if m.group(1) else "", snippet[1:-1])
+    try:
+        value = json.loads(f'"{fixed}"', strict=False)
+    except ValueError:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Returns the first balanced top-level JSON object in `text`, or None if there isn't one.
+
+    Single pass that tracks string literals and escapes, so braces inside string values
+    (e.g. a shell expansion like "${file##*.}") don't end the object early or late.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+class StreamingJsonParser:
+    """
+    Incrementally scans a JSON object that arrives in chunks (e.g. a streamed LLM response).
+
+    Tracks string/escape state and container depth so each top-level field of the root
+    object can be reported the moment its value closes, without waiting for the rest of
+    the response. Text before the root '{' (such as a markdown fence) and anything after
+    the matching '}' is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0                     # Next index of self._text to scan
+        self._stack: List[str] = []       # Open containers ('{' or '[')
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._awaiting_key = False        # At depth 1: next string is a key (vs. a value)
+        self._key: Optional[str] = None   # Current top-level key
+        self._value_start = -1            # Start index of the current top-level value
+        self._root_start = -1
+        self._root_end = -1
+        self.fields: Dict[str, Any] = {}
+        self.raw_fields: Dict[str, str] = {}  # Undecoded text of every top-level value, even invalid ones
+        self.complete = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Appends a chunk and scans it.
+
+        Args:
+            chunk: The next piece of streamed text.
+
+        Returns:
+            A list of (field_name, value) tuples for top-level fields completed by this chunk.
+        """
+        completed: List[Tuple[str, Any]] = []
+        if not chunk or self.complete:
+            return completed
+        self._text += chunk
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1:
+                        if self._awaiting_key:
+                            self._key = self._decode(text[self._string_start:i + 1])
+                        elif self._value_start == self._string_start:
+                            self._emit(text[self._value_start:i + 1], completed)
+                continue
+
+            if depth == 0:
+                # Skip everything until the root object opens
+                if char == "{":
+                    self._stack.append("{")
+                    self._root_start = i
+                    self._awaiting_key = True
+                continue
+
+            if depth == 1 and not self._awaiting_key and self._value_start < 0 and not char.isspace() and char not in ":,}":
+                self._value_start = i
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                if depth == 1 and self._value_start >= 0:
+                    # Scalar (number/true/false/null) ended by the closing brace
+                    self._emit(text[self._value_start:i].strip(), completed)
+                self._stack.pop()
+                if not self._stack:
+                    self._root_end = i
+                    self.complete = True
+                    self._pos = i + 1
+                    return completed
+                if len(self._stack) == 1 and self._value_start >= 0:
+                    self._emit(text[self._value_start:i + 1], completed)
+            elif depth == 1:
+                if char == ":":
+                    self._awaiting_key = False
+                elif char == ",":
+                    if self._value_start >= 0:
+                        self._emit(text[self._value_start:i].strip(), completed)
+                    self._awaiting_key = True
+
+        self._pos = len(text)
+        return completed
+
+    def get(self) -> str:
+        """
+        Returns the root object's exact text if it closed, otherwise everything fed so far.
+
+        A truncated object is deliberately not repaired: closing a dangling string would turn
+        a cut-off command into one that looks finished.
+        """
+        if self.complete:
+            return self._text[self._root_start:self._root_end + 1]
+        return self._text
+
+    def _emit(self, snippet: str, completed: List[Tuple[str, Any]]) -> None:
+        """Decodes a finished top-level value and records it under the current key."""
+        self._value_start = -1
+        if self._key is None:
+            return
+        self.raw_fields[self._key] = snippet
+        try:
+            value = loads(snippet)
+        except ValueError:
+            log.debug("Could not decode streamed value for key '%s': %s", self._key, snippet[:100])
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+
+    @staticmethod
+    def _decode(snippet: str) -> Optional[str]:
+        try:
+            return loads(snippet)
+        except ValueError:
+            return None
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging as log
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .config_manager import LLM_CACHE_PATH
+
+log = log.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Persistent key/value store for LLM responses, backed by a single SQLite table.
+
+    Lets a repeated request (same model, system prompt and user query) skip the network
+    round-trip entirely. Entries older than `ttl_days` are treated as misses and removed.
+    Any database error is logged and treated as a miss, so the cache can never break a run.
+    """
+
+    def __init__(self, path: Path = LLM_CACHE_PATH, ttl_days: float = 7, refresh: bool = False):
+        self.path = path
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.refresh = refresh  # Skip lookups (every get() misses) but still store new responses
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Returns a SHA-256 hex digest of the JSON-serialized parts."""
+        canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the database on first use, creating it (and its directory) if needed."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            # WAL lets concurrent toast runs read while another one writes; NORMAL sync is
+            # enough for a disposable cache
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, ts INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for `key`, or None on a miss, expired entry or refresh."""
+        if self.refresh:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT response, ts FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, ts = row
+            if time.time() - ts > self.ttl_seconds:
+                log.debug("Cached response %s... expired; removing it.", key[:12])
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            return response
+        except (sqlite3.Error, OSError) as e:
+            log.warning("Could not read response cache %s: %s", self.path, e)
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        """Stores (or replaces) the response for `key`."""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, ts) VALUES (?, ?, ?)",
+                    (key, response, int(time.time())),
+                )
+        except (sqlite3.Error, OSError) as e:
+            log.warning("Could not write response cache %s: %s", self.path, e)
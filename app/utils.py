@@ -1,12 +1,16 @@
+import json
 import os
 import platform
 import shutil
 import subprocess
 import logging as log
 import sys
+from functools import lru_cache
 from typing import Tuple, Optional
 from pathlib import Path
 
+from .config_manager import FFMPEG_VERSION_CACHE_PATH
+
 VERBOSE = False  # Global verbose flag for conditional traceback logging
 
 # --- Paths (Consider moving USER_CONFIG_DIR here if used often by utils) ---
@@ -36,58 +40,96 @@ def print_art():
     print(art)
 
 # --- System Info Gathering ---
+@lru_cache(maxsize=1)
 def get_ffmpeg_executable() -> str:
-    """Finds the ffmpeg executable path using shutil.which."""
+    """Finds the ffmpeg executable path using shutil.which. Cached for the process lifetime."""
     ffmpeg_path = shutil.which("ffmpeg")
     if ffmpeg_path is None:
         raise FileNotFoundError("ffmpeg executable not found in system PATH.")
     return ffmpeg_path
 
 def get_ffmpeg_version(ffmpeg_exe: str) -> str:
-    """Gets the first line of the ffmpeg version output."""
+    """
+    Gets the first line of the ffmpeg version output.
+    Cached on disk keyed by the executable's path, mtime and size, so `ffmpeg -version`
+    only runs again when the binary changes.
+    """
+    try:
+        st = os.stat(ffmpeg_exe)
+        cache_key = f"{ffmpeg_exe}:{st.st_mtime_ns}:{st.st_size}"
+    except OSError:
+        cache_key = None  # Can't key the cache; just query ffmpeg
+
+    if cache_key:
+        try:
+            with open(FFMPEG_VERSION_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("key") == cache_key and cached.get("version"):
+                log.debug("Using cached ffmpeg version from %s", FFMPEG_VERSION_CACHE_PATH)
+                return cached["version"]
+        except (OSError, ValueError, AttributeError):
+            pass  # Missing or unreadable cache: fall through to the subprocess
+
+    version = _query_ffmpeg_version(ffmpeg_exe)
+
+    if cache_key and "version" in version.lower() and not version.startswith("Unknown"):
+        try:
+            FFMPEG_VERSION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = FFMPEG_VERSION_CACHE_PATH.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"key": cache_key, "version": version}, f)
+            os.replace(tmp_path, FFMPEG_VERSION_CACHE_PATH)  # Atomic swap
+        except OSError as e:
+            log.debug("Could not write ffmpeg version cache: %s", e)
+    return version
+
+def _query_ffmpeg_version(ffmpeg_exe: str) -> str:
+    """Runs `ffmpeg -version` and returns the first line of its output."""
     try:
-        # Run ffmpeg -version
+        # Run ffmpeg -version, merging stderr into stdout so only one pipe is read.
+        # Bytes are kept as-is; only the first line is split off and decoded.
         result = subprocess.run(
             [ffmpeg_exe, "-version"],
-            capture_output=True,
-            text=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             check=False,  # Don't raise exception on non-zero exit (might output version to stderr)
             timeout=5     # Prevent hanging
         )
-        # FFmpeg might print version to stdout or stderr
-        output = result.stdout if "ffmpeg version" in result.stdout.lower() else result.stderr
-        # Extract the first line if output exists
-        if output and output.splitlines():
-            first_line = output.splitlines()[0].strip()
+        output = result.stdout.lstrip()
+        if output:
+            first_line = output.split(b"\n", 1)[0].decode("ascii", "replace").strip()
             # Return the first line if it looks like a version string
             if "version" in first_line.lower():
                 return first_line
             else:
                 # Fallback to returning the whole output if first line isn't version
-                log.warning(f"Could not parse version from first line: '{first_line}'. Returning full output.")
-                return output.strip()
+                full_output = output.decode("utf-8", "replace").strip()
+                log.warning("Could not parse version from first line: '%s'. Returning full output.", first_line)
+                return full_output
         else:
             return "Could not determine version (no output)."
     except FileNotFoundError:
-        log.warning(f"ffmpeg executable '{ffmpeg_exe}' not found during version check.", exc_info=VERBOSE)
+        log.warning("ffmpeg executable '%s' not found during version check.", ffmpeg_exe, exc_info=VERBOSE)
         return "Unknown (executable not found)"
     except subprocess.TimeoutExpired:
         log.warning("ffmpeg -version command timed out.", exc_info=VERBOSE)
         return "Unknown (timeout)"
     except Exception as e:
-        log.warning(f"Could not get ffmpeg version using '{ffmpeg_exe}': {e}", exc_info=VERBOSE)
+        log.warning("Could not get ffmpeg version using '%s': %s", ffmpeg_exe, e, exc_info=VERBOSE)
         return "Unknown (error)"
 
+@lru_cache(maxsize=1)
 def get_os_info() -> Tuple[str, str]:
-    """Gets the OS type and detailed OS information string."""
+    """Gets the OS type and detailed OS information string. Cached for the process lifetime."""
     os_type = platform.system()
     os_release = platform.release()
     os_machine = platform.machine()
     os_info_str = f"{os_type} {os_release} {os_machine}".strip()
     return os_type, os_info_str
 
+@lru_cache(maxsize=1)
 def get_default_shell() -> Optional[str]:
-    """Tries to determine the default user shell."""
+    """Tries to determine the default user shell. Cached for the process lifetime."""
     shell = os.getenv("SHELL")
     if shell:
         return shell
@@ -98,12 +140,10 @@ def get_default_shell() -> Optional[str]:
         return os.getenv("COMSPEC", "cmd.exe")
     elif os_type in ["Linux", "Darwin"]:  # macOS is Darwin
         # Check common shells in standard locations
-        if shutil.which('bash'):
-            return shutil.which('bash')
-        if shutil.which('zsh'):  # Add zsh check
-            return shutil.which('zsh')
-        if shutil.which('sh'):
-            return shutil.which('sh')
+        for candidate in ('bash', 'zsh', 'sh'):
+            candidate_path = shutil.which(candidate)
+            if candidate_path:
+                return candidate_path
     return None  # Could not determine
 
 # --- Error Printing ---
@@ -2,19 +2,21 @@ import argparse
 import logging as log
 import sys
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any
 
 # Keep path determination simple - only need script dir if loading adjacent modules
 try:
-    REAL_SCRIPT_FILE = os.path.realpath(__file__)
+    # No symlink resolution needed: SCRIPT_DIR only feeds the sys.path fallback below
+    REAL_SCRIPT_FILE = os.path.abspath(__file__)
 except NameError:
     REAL_SCRIPT_FILE = os.path.abspath(sys.argv[0])
 SCRIPT_DIR = os.path.dirname(REAL_SCRIPT_FILE)
 CURRENT_WORKDIR = os.getcwd()  # Still useful for context perhaps
 
-# Add SCRIPT_DIR to sys.path if needed for local imports (especially if not installed as package)
-if SCRIPT_DIR not in sys.path:
+# Add SCRIPT_DIR to sys.path only when run as a plain script; an installed package already resolves imports
+if not __package__ and SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
     # No logging here yet, setup basicConfig first
 
@@ -43,19 +45,24 @@ logger = log.getLogger()
 try:
     from app import app as toast_app_module
     from app import utils
-    import openai
 except ImportError as e:
     logger.exception("Failed to import core application modules.")
-    utils.eprint(f"[CRITICAL] Failed to import core app modules (app, utils, openai): {e}")
+    utils.eprint(f"[CRITICAL] Failed to import core app modules (app, utils): {e}")
     utils.eprint("Ensure app/app.py, app/utils.py, etc., exist and required libraries (openai) are installed.")
     sys.exit(1)
 
+# Validated level-name lookup (getLevelNamesMapping is Python 3.11+)
+if hasattr(log, "getLevelNamesMapping"):
+    _LOG_LEVELS = log.getLevelNamesMapping()
+else:
+    _LOG_LEVELS = {name: log.getLevelName(name) for name in ("CRITICAL", "FATAL", "ERROR", "WARN", "WARNING", "INFO", "DEBUG", "NOTSET")}
+
 def configure_logging(config: Dict[str, Any], verbose: bool):
     """Configures logging based on loaded config and CLI args."""
     # Use module-level logging constants from 'log'
     cli_level = log.DEBUG if verbose else log.INFO
     config_level_str = config.get("log_level", "INFO").upper()
-    config_level = getattr(log, config_level_str, log.INFO)
+    config_level = _LOG_LEVELS.get(config_level_str, log.INFO)
 
     # Use the more verbose level between CLI and config (DEBUG < INFO)
     final_level = min(cli_level, config_level)
@@ -82,21 +89,48 @@ def configure_logging(config: Dict[str, Any], verbose: bool):
             file_handler.setLevel(final_level)  # Log same level to file
             file_handler.setFormatter(formatter)
             logger.addHandler(file_handler)
-            logger.info(f"Logging to file: {config_manager.LOG_FILE_PATH}")
+            logger.info("Logging to file: %s", config_manager.LOG_FILE_PATH)
         except Exception as e:
-            logger.error(f"Failed to set up file logging to {config_manager.LOG_FILE_PATH}: {e}", exc_info=verbose)
+            logger.error("Failed to set up file logging to %s: %s", config_manager.LOG_FILE_PATH, e, exc_info=verbose)
             utils.eprint(f"[ERROR] Could not configure file logging: {e}")
 
-    logger.info(f"Logging configured. Level set to: {log.getLevelName(final_level)}")
+    logger.info("Logging configured. Level set to: %s", log.getLevelName(final_level))
+
+
+@lru_cache(maxsize=1)
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Builds the CLI argument parser once; repeated main() calls (e.g. tests) reuse it."""
+    parser = argparse.ArgumentParser(
+        description="pixel-toaster: Natural language FFmpeg command generator.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("query", nargs="*", default=[], help="Your natural language prompt for FFmpeg.")
+    input_group.add_argument("--batch", metavar="PATH", help="Read one prompt per line from a file and generate the\ncommands in as few LLM requests as possible, then run them in order.")
+    parser.add_argument("--dry-run", action="store_true", help="Show generated command without executing.")
+    parser.add_argument("--file", type=str, help="Specify input file explicitly.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached LLM responses and ask the LLM again\n(a successful new response still replaces the cached one).")
+    model_group = parser.add_mutually_exclusive_group()
+    model_group.add_argument("--local-only", action="store_true", help="Use only the local model from the 'local_llm_model' config key.")
+    model_group.add_argument("--cloud-only", action="store_true", help="Skip the local draft model and use the OpenAI model directly.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose debug output (overrides config level).")
+    # Add other args as needed
+    return parser
 
 
 def main(sys_args: List[str]):
     """
-    Main function: Loads config, parses args, sets up logging & OpenAI, runs the app.
+    Main function: Parses args, loads config, sets up logging, runs the app.
     """
+    # --- Argument Parsing ---
+    # Parsed before loading config, so --help and usage errors exit without reading the
+    # config file or starting first-time setup
+    args = build_arg_parser().parse_args(sys_args)
+
     # --- Load Configuration ---
     try:
-        config = config_manager.load_config()
+        # --local-only never calls the OpenAI API, so it doesn't need (or prompt for) a key
+        config = config_manager.load_config(require_api_key=not args.local_only)
     except SystemExit:  # Propagate exit from config loading errors
         raise
     except Exception as e:
@@ -104,47 +138,27 @@ def main(sys_args: List[str]):
         utils.eprint(f"[CRITICAL] Failed to load configuration: {e}")
         sys.exit(1)
 
-    # --- Argument Parsing ---
-    parser = argparse.ArgumentParser(
-        description="pixel-toaster: Natural language FFmpeg command generator.",
-        formatter_class=argparse.RawTextHelpFormatter
-    )
-    parser.add_argument("query", nargs="+", help="Your natural language prompt for FFmpeg.")
-    parser.add_argument("--dry-run", action="store_true", help="Show generated command without executing.")
-    parser.add_argument("--file", type=str, help="Specify input file explicitly.")
-    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose debug output (overrides config level).")
-    # Add other args as needed
-
-    args = parser.parse_args(sys_args)
-
     # --- Configure Logging (using loaded config and args) ---
     configure_logging(config, args.verbose)
-    logger.debug(f"Loaded configuration: {config}")  # Log sensitive data only in debug
-    logger.debug(f"Parsed arguments: {args}")
+    logger.debug("Loaded configuration: %s; parsed arguments: %s", config, args)  # Log sensitive data only in debug
 
     # --- Configure OpenAI Client ---
     api_key = config.get("openai_api_key")
-    if not api_key:
+    if not api_key and not args.local_only:
         # This *shouldn't* happen if load_config/initialize_config worked, but double-check.
         logger.critical("OpenAI API Key is missing after configuration load. Exiting.")
         utils.eprint("[CRITICAL] OpenAI API Key not available. Please ensure setup completed correctly.")
         sys.exit(1)
 
-    try:
-        openai.api_key = api_key
-        # Maybe add a check here if needed: e.g., list models (can be slow/colog = log.getLogger(__name__)stly)
-        # openai.models.list()
-        logger.info("OpenAI library configured with API key.")
-    except Exception as e:
-        logger.error("Error configuring OpenAI library:", exc_info=args.verbose)
-        utils.eprint(f"[ERROR] Failed to configure OpenAI library: {e}")
-        sys.exit(1)
+    # Hand the key to the generator instead of configuring the OpenAI library here;
+    # it is applied lazily right before the first API request.
+    config["_resolved_api_key"] = api_key
 
     # --- Run the Core Application Logic ---
     logger.info("Handing control to the application runner...")
     # Pass parsed args AND the loaded config to the app runner.
     exit_code = toast_app_module.run_toast_app(args, config)
-    logger.info(f"Application runner finished with exit code {exit_code}.")
+    logger.info("Application runner finished with exit code %s.", exit_code)
     return exit_code
 
 # --- Script Execution Guard ---
@@ -153,7 +167,7 @@ if __name__ == "__main__":
     try:
         final_exit_code = main(sys.argv[1:])
     except SystemExit as e:
-        logger.info(f"SystemExit caught with code: {e.code}")
+        logger.info("SystemExit caught with code: %s", e.code)
         final_exit_code = e.code if isinstance(e.code, int) else 1
     except KeyboardInterrupt:
         utils.eprint("\n[INFO] Execution interrupted by user (Ctrl+C).")
@@ -164,6 +178,8 @@ if __name__ == "__main__":
         utils.eprint(f"[CRITICAL ERROR] An unexpected error occurred: {e}")
         final_exit_code = 1
     finally:
-        logger.info(f"Pixel Toaster exiting with final code: {final_exit_code}")
-        log.shutdown()  # Ensure log handlers flush buffers
+        logger.info("Pixel Toaster exiting with final code: %s", final_exit_code)
+        # Only file handlers need an explicit flush/close; stdout is fine with normal interpreter exit
+        if any(isinstance(h, log.FileHandler) for h in logger.handlers):
+            log.shutdown()
         sys.exit(final_exit_code)
\ No newline at end of file